@@ -1,10 +1,16 @@
-import glob
-import json
 import ast
+import functools
 from textwrap import dedent
+from types import MappingProxyType
 
 from pathlib import Path
 
+TABLE_HEADER = (
+    "| Name | Type | Default | Description |\n"
+    "| ---- | ---- | ------- | ----------- |\n"
+)
+TABLE_ROW = "| `{varname}` | {type_} | {default} | {description} |\n"
+
 
 def recursive_infer_attribute_ast(obj: ast.Attribute):
     lst = []
@@ -18,24 +24,26 @@ def recursive_infer_attribute_ast(obj: ast.Attribute):
 
 
 def get_default(obj):
-    if isinstance(obj, ast.Num):
-        return obj.n
-    if isinstance(obj, ast.Str):
-        return f'"{obj.s}"'
-    if isinstance(obj, ast.NameConstant):
-        return str(obj.value)
+    if isinstance(obj, ast.Constant):
+        value = obj.value
+        if isinstance(value, str):
+            return f'"{value}"'
+        if value is None or isinstance(value, bool):
+            return str(value)
+        return value
     elif isinstance(obj, ast.Name):
-        return obj
+        return obj.id
     elif isinstance(obj, ast.Attribute):
-        ".".join(recursive_infer_attribute_ast(obj))
+        return ".".join(recursive_infer_attribute_ast(obj))
     else:
         raise ValueError(f"Unexpected default value: {obj}")
 
 
 def line_is_delim(i, lines, delim="-"):
-    if i == len(lines):
+    if i >= len(lines):
         return False
-    return lines[i].startswith(delim) and all(c == delim for c in lines[i])
+    line = lines[i]
+    return len(line) > 0 and line.count(delim) == len(line)
 
 
 def extract_content_from_ast(node: ast.FunctionDef, remove_self=False):
@@ -56,8 +64,8 @@ def extract_content_from_ast(node: ast.FunctionDef, remove_self=False):
         annot = arg.annotation
         if hasattr(annot, "id"):
             type_ = arg.annotation.id
-        elif hasattr(annot, "s"):
-            type_ = arg.annotation.s
+        elif isinstance(annot, ast.Constant):
+            type_ = annot.value
         elif annot is None:
             type_ = None
         elif isinstance(annot, ast.Attribute):
@@ -82,28 +90,40 @@ def extract_content_from_ast(node: ast.FunctionDef, remove_self=False):
     return {"docstring": docstring, "args": args}
 
 
+@functools.lru_cache(maxsize=4096)
 def parse_docstring(content: str, parse_params=True, parse_returns=True):
     """
     This parses a docstring formatted using the pandas docstring format.
+    The result is cached and returned as a read-only mapping, so identical
+    docstrings are only parsed once.
     """
     lines = content.splitlines()
     key = "Description"
+
+    # section underlines are lines of dashes (see line_is_delim), so without any dash
+    # the whole docstring is the description
+    if "-" not in content:
+        return MappingProxyType({key: lines})
+
     content = {key: []}
 
-    for i, line in enumerate(lines):
-        if line_is_delim(i + 1, lines):
+    # the extra entry (i == len(lines)) is always False, so the last line has a successor
+    is_delim = [line_is_delim(i, lines) for i in range(len(lines) + 1)]
+
+    for line, line_delim, next_delim in zip(lines, is_delim, is_delim[1:]):
+        if next_delim:
             key = line
             content[key] = []
-        elif not line_is_delim(i, lines):
+        elif not line_delim:
             content[key].append(line)
 
     if parse_params and "Parameters" in content:
-        content["Parameters"] = parse_docstring_params(content["Parameters"])
+        content["Parameters"] = parse_docstring_params(tuple(content["Parameters"]))
 
     if parse_returns and "Returns" in content:
-        content["Returns"] = parse_docstring_params(content["Returns"])
+        content["Returns"] = parse_docstring_params(tuple(content["Returns"]))
 
-    return content
+    return MappingProxyType(content)
 
 
 def infer_default_in_description(line: str):
@@ -125,12 +145,15 @@ def infer_default_in_description(line: str):
     return line, default
 
 
-def parse_docstring_params(lines: "list[str]"):
+@functools.lru_cache(maxsize=4096)
+def parse_docstring_params(lines: "tuple[str]"):
     """
     This parses a docstring formatted using the pandas docstring format.
+    The lines must be given as a tuple so that the result can be cached.
     """
     params = {}
     varname = None
+    description = []
 
     for line in lines:
         if line == "":
@@ -139,9 +162,14 @@ def parse_docstring_params(lines: "list[str]"):
         if line.startswith(" "):
             if varname is None:
                 raise ValueError("Unexpected line in docstring: " + line)
-            params[varname]["description"].append(line)
+            description.append(line)
 
         else:
+            # a new parameter starts, so the description of the previous one is complete
+            if varname is not None:
+                params[varname]["description"] = dedent("\n".join(description))
+                description = []
+
             if ":" in line:
                 varname, line = line.split(":", maxsplit=1)
                 varname = varname.strip()
@@ -152,29 +180,28 @@ def parse_docstring_params(lines: "list[str]"):
                 type_name = None
                 varname, default = infer_default_in_description(line)
 
-            params[varname] = {"type": type_name, "default": default, "description": []}
+            params[varname] = {"type": type_name, "default": default}
 
-    for key, value in params.items():
-        params[key]["description"] = dedent("\n".join(value["description"]))
+    if varname is not None:
+        params[varname]["description"] = dedent("\n".join(description))
 
-    return params
+    return MappingProxyType(params)
 
 
 def param_dict_to_markdown_table(params: dict, args: dict):
     """
     This converts the output of parse_docstring_params to a markdown table.
     """
-    markdown = ""
-    markdown += "| Name | Type | Default | Description |\n"
-    markdown += "| ---- | ---- | ------- | ----------- |\n"
+    parts = [TABLE_HEADER]
 
     for varname, p in params.items():
         type_ = p["type"]
         default = p["default"]
         description = p["description"].replace("\n", " ")
 
-        sig_type_ = args[varname]["type"]
-        sig_default = args[varname]["default"]
+        sig = args[varname]
+        sig_type_ = sig["type"]
+        sig_default = sig["default"]
 
         if type_ is None and sig_type_ is not None:
             type_ = sig_type_
@@ -196,9 +223,13 @@ def param_dict_to_markdown_table(params: dict, args: dict):
         else:
             default = f"`{default}`"
 
-        markdown += f"| `{varname}` | {type_} | {default} | {description} |\n"
+        parts.append(
+            TABLE_ROW.format(
+                varname=varname, type_=type_, default=default, description=description
+            )
+        )
 
-    return markdown
+    return "".join(parts)
 
 
 def md_header(text, level):
@@ -207,9 +238,10 @@ def md_header(text, level):
 
 def signature_list_from_args(args):
     signature = []
-    for name in args:
-        if args[name]["default"] is not None:
-            signature.append(f"{name}={args[name]['default']}")
+    for name, arg in args.items():
+        default = arg["default"]
+        if default is not None:
+            signature.append(f"{name}={default}")
         else:
             signature.append(f"{name}")
     return signature
@@ -233,49 +265,51 @@ def format_docstring_to_markdown(
     args = node_content["args"]
     signature_lst = signature_list_from_args(args)
 
-    markdown = md_header(f"`{node_name}`", level=level)
-    markdown += f"```python\n{full_node_name}({', '.join(signature_lst)})\n```\n\n"
+    parts = [
+        md_header(f"`{node_name}`", level=level),
+        f"```python\n{full_node_name}({', '.join(signature_lst)})\n```\n\n",
+    ]
 
     if doc_str_dict is None:
-        return markdown
+        return "".join(parts)
 
     for key, value in doc_str_dict.items():
-        markdown += md_header(key, level=max(4, level + 1))
+        parts.append(md_header(key, level=max(4, level + 1)))
 
         if key == "Parameters":
-            markdown += param_dict_to_markdown_table(value, args)
+            parts.append(param_dict_to_markdown_table(value, args))
 
         elif key == "Returns":
             if len(value) == 1:
-                k, v = list(value.items())[0]
-                markdown += f"```\n{k}\n```\n\n{v['description']}"
+                k, v = next(iter(value.items()))
+                parts.append(f"```\n{k}\n```\n\n{v['description']}")
             else:
-                markdown += param_dict_to_markdown_table(value)
+                parts.append(param_dict_to_markdown_table(value))
 
         elif key == "Examples":
-            markdown += "```python\n"
-            markdown += "\n".join(value)
-            markdown += "\n```\n\n"
+            parts.append("```python\n")
+            parts.append("\n".join(value))
+            parts.append("\n```\n\n")
 
         elif isinstance(value, str):
-            markdown += value
+            parts.append(value)
 
         elif isinstance(value, list):
-            markdown += "\n".join(value)
+            parts.append("\n".join(value))
 
         else:
             raise ValueError(f"Unexpected value for key {key}: {value}")
 
-        markdown += "\n\n"
+        parts.append("\n\n")
 
-    return markdown
+    return "".join(parts)
 
 
 def format_module_from_content(node_contents: dict, module_prefix: str = None):
-    formatted_page = ""
+    parts = []
 
     if module_prefix is not None:
-        formatted_page += md_header(f"Reference for `{module_prefix}`", level=1)
+        parts.append(md_header(f"Reference for `{module_prefix}`", level=1))
 
     for name, node_content in node_contents.items():
         if node_content["docstring"] is not None:
@@ -289,9 +323,9 @@ def format_module_from_content(node_contents: dict, module_prefix: str = None):
         formatted = format_docstring_to_markdown(
             node_content, node_name=name, module_prefix=module_prefix, level=level
         )
-        formatted_page += formatted
+        parts.append(formatted)
 
-    return formatted_page
+    return "".join(parts)
 
 
 def parse_content_from_ast(tree: ast.Module) -> dict:
@@ -299,78 +333,127 @@ def parse_content_from_ast(tree: ast.Module) -> dict:
 
     for node in tree.body:
         if isinstance(node, ast.FunctionDef):
-            name = node.name
             if node.name.startswith("_"):
                 continue
 
-            node_contents[name] = extract_content_from_ast(node)
+            node_contents[node.name] = extract_content_from_ast(node)
 
-        if isinstance(node, ast.ClassDef):
-            cls_ = node
-            for node in cls_.body:
-                if not isinstance(node, ast.FunctionDef):
+        elif isinstance(node, ast.ClassDef):
+            cls_name = node.name
+
+            for sub in node.body:
+                if not isinstance(sub, ast.FunctionDef):
                     continue
 
-                if node.name.startswith("_") and not node.name.endswith("__"):
+                if sub.name.startswith("_") and not sub.name.endswith("__"):
                     continue
 
-                if node.name == "__init__":
-                    name = cls_.name
+                if sub.name == "__init__":
+                    name = cls_name
                     remove_self = True
                 else:
-                    name = f"{cls_.name}.{node.name}"
+                    name = f"{cls_name}.{sub.name}"
                     remove_self = False
 
                 node_contents[name] = extract_content_from_ast(
-                    node, remove_self=remove_self
+                    sub, remove_self=remove_self
                 )
-                node_contents[name]["class"] = cls_.name
+                node_contents[name]["class"] = cls_name
 
     return node_contents
 
 
+@functools.lru_cache(maxsize=None)
+def parse_source_cached(source: bytes) -> ast.Module:
+    """
+    Cached version of ast.parse, so a source file is only parsed once per process
+    while its content does not change.
+    """
+    return ast.parse(source)
+
+
+def load_tree_cached(path) -> ast.Module:
+    """
+    Parses a python file into an AST, reusing the tree parsed earlier in the same
+    process if the file content did not change.
+    """
+    # ast.parse accepts bytes directly and handles the encoding itself
+    return parse_source_cached(Path(path).read_bytes())
+
+
+@functools.lru_cache(maxsize=None)
+def glob_cached(pattern: str) -> tuple:
+    """
+    Cached version of glob.glob, so each pattern only scans the filesystem once.
+    """
+    import glob
+
+    return tuple(glob.glob(pattern))
+
+
+@functools.lru_cache(maxsize=None)
+def get_module_prefix(source: str) -> str:
+    """
+    Converts the path of a source file to its dotted module name, e.g.
+    wikicat/viewer/__init__.py becomes wikicat.viewer
+    """
+    return ".".join(Path(source).parts).replace(".py", "").replace(".__init__", "")
+
+
 def build_globed_sources(sources):
     sources_globed = []
     for s in sources:
-        sources_globed.extend(glob.glob(s))
+        sources_globed.extend(glob_cached(s))
     sources_globed = sorted(sources_globed)
     return sources_globed
 
 
 def build_docs(sources_globed):
-    doc_page = ""
+    parts = []
 
     for source in sources_globed:
-        source = Path(source)
-        with open(source, "r") as f:
-            tree = ast.parse(f.read())
+        tree = load_tree_cached(source)
 
         node_contents = parse_content_from_ast(tree)
-        module_prefix = (
-            ".".join(source.parts).replace(".py", "").replace(".__init__", "")
-        )
+        module_prefix = get_module_prefix(str(source))
         doc_page_part = format_module_from_content(
             node_contents, module_prefix=module_prefix
         )
-        doc_page += doc_page_part
+        parts.append(doc_page_part)
+
+    return "".join(parts)
 
-    return doc_page
+
+def render_target(target, source_lst):
+    """
+    Builds the documentation page for a single target of render_paths.json.
+    Returns the target, the globbed sources and the generated page.
+    """
+    sources_globed = build_globed_sources(source_lst)
+    doc_page = build_docs(sources_globed)
+    return target, sources_globed, doc_page
 
 
 if __name__ == "__main__":
+    from concurrent.futures import ProcessPoolExecutor
+    import json
+
     with open("scripts/docs/render_paths.json", "r") as f:
         render_paths = json.load(f)
 
-    for target, source_lst in render_paths.items():
-        target = Path(target)
-        target.parent.mkdir(parents=True, exist_ok=True)
-        sources_globed = build_globed_sources(source_lst)
+    # each target is independent, so they are rendered in separate processes
+    with ProcessPoolExecutor() as executor:
+        results = executor.map(
+            render_target, render_paths.keys(), render_paths.values()
+        )
 
-        print("Target doc file:", target)
-        print("Parsing python files:", sources_globed)
-        print("-" * 50)
+        for target, sources_globed, doc_page in results:
+            target = Path(target)
+            target.parent.mkdir(parents=True, exist_ok=True)
 
-        doc_page = build_docs(sources_globed)
+            print("Target doc file:", target)
+            print("Parsing python files:", sources_globed)
+            print("-" * 50)
 
-        with open(target, "w") as f:
-            f.write(doc_page)
+            with open(target, "w") as f:
+                f.write(doc_page)
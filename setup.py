@@ -1,27 +1,25 @@
-import ast
+from pathlib import Path
+import re
+
 from setuptools import setup, find_packages
 
 
-def get_version(path, var="__version__"):
-    with open(path) as f:
-        body = ast.parse(f.read()).body
+def read_text(path):
+    return Path(path).read_text()
 
-    for node in body:
-        if isinstance(node, ast.Assign) and node.targets[0].id == var:
-            version = node.value.s
-            return version
 
-    return None
+def get_version(path, var="__version__"):
+    match = re.search(rf"^{var}\s*=\s*[\"']([^\"']+)[\"']", read_text(path), re.M)
 
+    if match is None:
+        return None
 
-with open("README.md", "r") as f:
-    long_description = f.read()
+    return match.group(1)
 
-with open("wikicat/viewer/requirements.txt") as f:
-    viewer_requirements = f.read().splitlines()
 
-with open("wikicat/processing/requirements.txt") as f:
-    processing_requirements = f.read().splitlines()
+long_description = read_text("README.md")
+viewer_requirements = read_text("wikicat/viewer/requirements.txt").splitlines()
+processing_requirements = read_text("wikicat/processing/requirements.txt").splitlines()
 
 version = get_version("wikicat/version.py")
 
@@ -48,5 +46,6 @@ setup(
         "dev": ["black==23.*", "wheel"],
         "viewer": viewer_requirements,
         "processing": processing_requirements,
+        "fast": ["orjson", "flask-compress"],
     },
 )
@@ -24,3 +24,14 @@ class TestDocs(unittest.TestCase):
 
             with open(target, "r") as f:
                 self.assertEqual(f.read(), doc_page, error_msg)
+
+    def test_parse_docstring_sections(self):
+        parsed = doc_build.parse_docstring("Summary\n\nNotes\n-\nShort underline")
+        self.assertEqual(
+            dict(parsed), {"Description": ["Summary", ""], "Notes": ["Short underline"]}
+        )
+
+        parsed = doc_build.parse_docstring("A single-paragraph docstring")
+        self.assertEqual(
+            dict(parsed), {"Description": ["A single-paragraph docstring"]}
+        )
@@ -0,0 +1,241 @@
+import json
+import os
+import tempfile
+import unicodedata
+import unittest
+
+import wikicat as wc
+
+
+def build_graph_json():
+    id_to_title = {
+        "1": "Hidden_categories",
+        "2": "Science",
+        "3": "Physics",
+        "4": "Stub_categories",
+        "5": "Gravity",
+        "6": "Mechanics",
+    }
+    id_to_namespace = {id_: "14" for id_ in id_to_title}
+    id_to_namespace["5"] = "0"
+
+    title_to_id = {"0": {}, "14": {}}
+    for id_, title in id_to_title.items():
+        title_to_id[id_to_namespace[id_]][title] = id_
+
+    return {
+        "id_to_title": id_to_title,
+        "id_to_namespace": id_to_namespace,
+        "title_to_id": title_to_id,
+        "parents_to_children": {"1": "4", "2": "3 4 6", "3": "5 6", "6": "5"},
+        "children_to_parents": {"3": "2", "4": "1 2", "5": "3 6", "6": "2 3"},
+    }
+
+
+class TestStandardize(unittest.TestCase):
+    def test_standardize(self):
+        titles = ["Montreal", "Cat 7 Montre\u0301al", "Hidden categories", "Éire", ""]
+
+        for form in ["NFC", "NFD", "NFKC", "NFKD"]:
+            expected = [
+                unicodedata.normalize(form, title.replace(" ", "_")) for title in titles
+            ]
+            self.assertEqual([wc.standardize(t, form=form) for t in titles], expected)
+            self.assertEqual(wc.standardize_many(titles, form=form), expected)
+
+
+class TestCategoryGraph(unittest.TestCase):
+    def setUp(self):
+        self.cg = wc.CategoryGraph(build_graph_json())
+
+    def test_hidden_categories(self):
+        self.assertEqual(self.cg.hidden_categories, frozenset({"4"}))
+
+    def test_get_children(self):
+        self.assertEqual(self.cg.get_children(id="2", return_as="id"), ["3", "6"])
+        self.assertEqual(
+            self.cg.get_children(id="2", include_hidden=True, return_as="id"),
+            ["3", "4", "6"],
+        )
+        self.assertEqual(self.cg.get_children(id="5", return_as="id"), [])
+
+    def test_get_children_namespace(self):
+        self.assertEqual(
+            self.cg.get_children(id="3", child_namespace="article", return_as="id"),
+            ["5"],
+        )
+        self.assertEqual(
+            self.cg.get_children(id="3", child_namespace="category", return_as="id"),
+            ["6"],
+        )
+        self.assertEqual(
+            self.cg.get_children(
+                id="2", child_namespace="category", include_hidden=True
+            ),
+            self.cg.get_children(id="2", include_hidden=True),
+        )
+        self.assertRaises(
+            ValueError, self.cg.get_children, id="3", child_namespace="user"
+        )
+
+    def test_get_parents(self):
+        self.assertEqual(
+            self.cg.get_parents(
+                title="Gravity", namespace="article", return_as="title"
+            ),
+            ["Physics", "Mechanics"],
+        )
+        self.assertEqual(self.cg.get_parents(id="4", return_as="id"), ["1", "2"])
+
+    def test_adjacency_properties(self):
+        graph_json = build_graph_json()
+        self.assertEqual(self.cg.parents_to_children, graph_json["parents_to_children"])
+        self.assertEqual(self.cg.children_to_parents, graph_json["children_to_parents"])
+        self.assertIs(self.cg.parents_to_children, self.cg.parents_to_children)
+        with self.assertRaises(TypeError):
+            self.cg.parents_to_children["7"] = "2"
+
+        self.cg._append_page("7", "Root", "category", child_ids=["2"])
+        self.assertEqual(self.cg.parents_to_children["7"], "2")
+        self.assertNotIn("7", self.cg.children_to_parents)
+
+    def test_get_degree_counts(self):
+        counts = self.cg.get_degree_counts()
+        self.assertEqual(counts["2"], 2)
+        self.assertEqual(counts["5"], 2)
+
+        for include_hidden in [False, True]:
+            counts = self.cg.get_degree_counts(include_hidden=include_hidden)
+            for id_ in self.cg.id_to_title:
+                parents = self.cg.get_parents(
+                    id=id_, include_hidden=include_hidden, return_as="id"
+                )
+                children = self.cg.get_children(
+                    id=id_, include_hidden=include_hidden, return_as="id"
+                )
+                self.assertEqual(counts[id_], len(parents) + len(children))
+
+    def test_get_degree_counts_cache(self):
+        counts = self.cg.get_degree_counts()
+        self.assertIs(self.cg.get_degree_counts(), counts)
+        self.assertIsNot(self.cg.get_degree_counts(include_hidden=True), counts)
+        self.assertIsNot(self.cg.get_degree_counts(use_cache=False), counts)
+
+        self.cg._append_page("7", "Root", "category", child_ids=["2"])
+        counts = self.cg.get_degree_counts()
+        self.assertEqual(counts["7"], 1)
+
+    def test_page_cache(self):
+        page = self.cg.get_page_from_id("3")
+        self.assertIs(self.cg.get_page_from_title("Physics", "category"), page)
+        self.assertIs(self.cg.get_children(id="2", return_as="page")[0], page)
+
+    def test_format_pages(self):
+        pages = self.cg.get_parents(id="4", include_hidden=True, return_as="page")
+        self.assertEqual(self.cg.format_pages(pages), "Hidden categories; Science")
+        self.assertEqual(
+            self.cg.format_pages(pages, sep="_", replace_underscores=False),
+            "Hidden_categories_Science",
+        )
+        self.assertEqual(
+            self.cg.format_pages(iter(pages), sep="_"), "Hidden categories_Science"
+        )
+
+    def test_traverse(self):
+        page = self.cg.get_page_from_id("5")
+        self.assertEqual(
+            self.cg.traverse(page, "parents", level=2, return_as="id"),
+            ["3", "6", "2"],
+        )
+        self.assertEqual(
+            self.cg.traverse(page, "parents", level=2, flatten=False, return_as="id"),
+            [["3", "6"], ["2"]],
+        )
+
+    def test_dense_ids(self):
+        dense_ids = self.cg.to_dense_ids(["2", "5"])
+        self.assertEqual(self.cg.from_dense_ids(dense_ids), ["2", "5"])
+
+        children = self.cg.get_dense_neighbors(dense_ids[0], "children")
+        self.assertEqual(self.cg.from_dense_ids(children), ["3", "6"])
+        children = self.cg.get_dense_neighbors(dense_ids[0], "children", True)
+        self.assertEqual(self.cg.from_dense_ids(children), ["3", "4", "6"])
+        parents = self.cg.get_dense_neighbors(dense_ids[1], "parents")
+        self.assertEqual(self.cg.from_dense_ids(parents), ["3", "6"])
+
+        self.assertRaises(ValueError, self.cg.to_dense_ids, ["8"])
+        self.assertRaises(ValueError, self.cg.get_dense_neighbors, 0, "siblings")
+
+    def test_append_page(self):
+        self.cg._append_page("7", "Root", "category", child_ids=["2"])
+        self.assertEqual(self.cg.get_children(id="7", return_as="id"), ["2"])
+        self.assertEqual(self.cg.get_parents(id="7", return_as="id"), [])
+        self.assertEqual(self.cg.get_page_from_title("Root", "category").id, "7")
+
+    def test_lazy_csr(self):
+        cg = wc.CategoryGraph(build_graph_json())
+        self.assertEqual(cg._adjacency, {})
+
+        self.assertEqual(cg.get_children(id="2", return_as="id"), ["3", "6"])
+        self.assertEqual(list(cg._adjacency), ["children"])
+
+        parents = cg.get_parents(id="4", return_as="id", include_hidden=True)
+        self.assertEqual(parents, ["1", "2"])
+        self.assertEqual(sorted(cg._adjacency), ["children", "parents"])
+        self.assertEqual(list(cg._visible_adjacency), ["children"])
+
+        cg._append_page("7", "Root", "category", child_ids=["2", "4"])
+        self.assertEqual(cg.get_children(id="7", return_as="id"), ["2"])
+        self.assertEqual(
+            cg.get_children(id="7", return_as="id", include_hidden=True), ["2", "4"]
+        )
+        self.assertEqual(list(cg._visible_adjacency), ["children"])
+
+        # the filtered CSR built after the page was added also contains it
+        cg._append_page("8", "Leaf", "category", parent_ids=["7", "4"])
+        self.assertEqual(cg.get_parents(id="8", return_as="id"), ["7"])
+
+    def test_int_title_to_id(self):
+        graph_json = build_graph_json()
+        for titles in graph_json["title_to_id"].values():
+            titles.update({title: int(id_) for title, id_ in titles.items()})
+        cg = wc.CategoryGraph(graph_json)
+
+        self.assertEqual(cg.get_page_from_title("Physics", "category").id, "3")
+        self.assertEqual(cg.get_children(title="Science", return_as="id"), ["3", "6"])
+        self.assertEqual(cg.hidden_categories, frozenset({"4"}))
+
+    def test_list_adjacency(self):
+        graph_json = build_graph_json()
+        for key in ["parents_to_children", "children_to_parents"]:
+            graph_json[key] = {
+                id_: [int(n) for n in ids.split()]
+                for id_, ids in graph_json[key].items()
+            }
+        cg = wc.CategoryGraph(graph_json)
+
+        self.assertEqual(cg.get_children(id="2", return_as="id"), ["3", "6"])
+        self.assertEqual(cg.get_parents(id="4", return_as="id"), ["1", "2"])
+        self.assertEqual(cg.hidden_categories, frozenset({"4"}))
+
+    def test_traverse_cycle(self):
+        graph_json = build_graph_json()
+        graph_json["children_to_parents"]["2"] = "3"
+        graph_json["parents_to_children"]["3"] += " 2"
+        cg = wc.CategoryGraph(graph_json)
+
+        page = cg.get_page_from_id("3")
+        self.assertEqual(cg.traverse(page, "parents", level=3, return_as="id"), ["2"])
+
+    def test_read_json_csr_cache(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "graph.json")
+            with open(path, "w") as f:
+                json.dump(build_graph_json(), f)
+
+            for _ in range(2):
+                cg = wc.CategoryGraph.read_json(path, csr_cache=True)
+                self.assertTrue(os.path.exists(path + ".csr"))
+                self.assertEqual(cg.get_children(id="2", return_as="id"), ["3", "6"])
+                self.assertEqual(cg.get_parents(id="4", return_as="id"), ["1", "2"])
+                self.assertEqual(cg.hidden_categories, frozenset({"4"}))
@@ -0,0 +1,333 @@
+from contextlib import redirect_stdout
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from importlib.util import find_spec
+import io
+import json
+import os
+from pathlib import Path
+import tempfile
+import threading
+import unittest
+from urllib.error import ContentTooShortError, HTTPError
+
+from wikicat.processing.download_dump import download_dump
+
+DUMP_CONTENT = bytes(range(256)) * 4
+
+
+class DumpHandler(BaseHTTPRequestHandler):
+    # number of bytes of the content that are not sent, to simulate a dropped connection
+    missing_bytes = 0
+
+    def do_GET(self):
+        start = int(self.headers.get("Range", "bytes=0-")[6:].rstrip("-"))
+        size = len(DUMP_CONTENT)
+
+        if start >= size:
+            self.send_response(416)
+            self.send_header("Content-Range", f"bytes */{size}")
+            self.end_headers()
+            return
+
+        self.send_response(206 if start > 0 else 200)
+        if start > 0:
+            self.send_header("Content-Range", f"bytes {start}-{size - 1}/{size}")
+        self.send_header("Content-Length", str(size - start))
+        self.end_headers()
+        self.wfile.write(DUMP_CONTENT[start : size - self.missing_bytes])
+        self.close_connection = True
+
+    def log_message(self, format, *args):
+        pass
+
+
+@unittest.skipIf(find_spec("pandas") is None, "pandas is required for processing")
+class TestGenerateGraph(unittest.TestCase):
+    def test_na_titles_from_csv(self):
+        from wikicat.processing import generate_graph
+
+        rows = [
+            "page_id,page_namespace,page_title,cl_to,cl_type",
+            "1,14,Hidden_categories,Root,subcat",
+            "2,14,NA,Root,subcat",
+            "3,0,Gravity,NA,page",
+            "4,0,null,NA,page",
+        ]
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            int_dir = os.path.join(tmp_dir, "enwiki_2018_12_20")
+            os.makedirs(int_dir)
+            with open(os.path.join(int_dir, "full_catgraph.csv"), "w") as f:
+                f.write("\n".join(rows) + "\n")
+
+            generate_graph.main(2018, 12, 20, tmp_dir, ignore_existing=False)
+
+            with open(os.path.join(int_dir, "category_graph.json")) as f:
+                graph_json = json.load(f)
+
+        self.assertEqual(graph_json["id_to_title"]["2"], "NA")
+        self.assertEqual(graph_json["id_to_title"]["4"], "null")
+        self.assertEqual(graph_json["children_to_parents"]["3"], [2])
+        self.assertEqual(graph_json["children_to_parents"]["4"], [2])
+        self.assertEqual(graph_json["parents_to_children"]["2"], [3, 4])
+        self.assertNotIn("1", graph_json["parents_to_children"])
+
+    def test_standardize_series_missing_titles(self):
+        import pandas as pd
+        from wikicat.processing.generate_graph import standardize_series
+
+        titles = pd.Series(["A b", None, "A_b", "C"])
+        standardized = standardize_series(titles)
+
+        self.assertEqual(standardized[0], "A_b")
+        self.assertTrue(pd.isna(standardized[1]))
+        self.assertEqual(standardized[2], "A_b")
+        self.assertEqual(standardized[3], "C")
+
+        standardized = standardize_series(pd.Series([None, None], dtype=object))
+        self.assertTrue(standardized.isna().all())
+
+    def test_missing_parent_not_linked(self):
+        import pandas as pd
+        from wikicat.processing.generate_graph import generate_graph
+
+        df = pd.DataFrame(
+            {
+                "page_id": [1, 2, 3],
+                "page_title": ["Physics", "Zoology", "Gravity"],
+                "cl_to": ["Root", "Physics", None],
+                "cl_type": ["subcat", "subcat", "page"],
+            }
+        )
+        graph_json = generate_graph(df)
+
+        self.assertEqual(graph_json["parents_to_children"], {1: [2]})
+        self.assertNotIn(3, graph_json["children_to_parents"])
+
+
+PAGE_ROWS = [
+    "page_id,page_namespace,page_title",
+    "1,14,Science",
+    "2,14,NA",
+    "3,0,Gravity",
+    "4,2,User_page",
+]
+CATEGORY_ROWS = [
+    "cl_from,cl_to,cl_type",
+    "1,Root,subcat",
+    "3,Science,page",
+    "3,NA,page",
+    "4,Science,page",
+    "5,Science,page",
+]
+CATEGORY_DUMP = (
+    "INSERT INTO `categorylinks` VALUES "
+    "(1,'Root','ROOT','2018-01-01 00:00:00','','uppercase','subcat'),"
+    "(3,'Science','GRAVITY','2018-01-01 00:00:00','','uppercase','page'),"
+    "(3,'NA','GRAVITY','2018-01-01 00:00:00','','uppercase','page');\n"
+)
+
+
+@unittest.skipIf(find_spec("pandas") is None, "pandas is required for processing")
+class TestMergeTables(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.int_dir = Path(self.tmp_dir.name, "enwiki_2018_12_20")
+        self.int_dir.mkdir()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write_csv(self, name, rows):
+        path = self.int_dir / name
+        path.write_text("\n".join(rows) + "\n")
+        return path
+
+    def assert_merged(self, df):
+        # the link from page 4 (not an article or category) and the one from page 5
+        # (not in the page table) are dropped
+        self.assertEqual(list(df.index), [1, 3, 3])
+        self.assertEqual(df.index.name, "page_id")
+        self.assertEqual(
+            list(df.columns), ["page_namespace", "page_title", "cl_to", "cl_type"]
+        )
+        self.assertEqual(list(df["page_namespace"]), [14, 0, 0])
+        self.assertEqual(list(df["page_title"]), ["Science", "Gravity", "Gravity"])
+        self.assertEqual(list(df["cl_to"]), ["Root", "Science", "NA"])
+        self.assertEqual(list(df["cl_type"]), ["subcat", "page", "page"])
+
+    def test_merge_tables_csv(self):
+        import pandas as pd
+        from wikicat.processing import merge_tables
+
+        self.write_csv("page.csv", PAGE_ROWS)
+        self.write_csv("categorylinks.csv", CATEGORY_ROWS)
+
+        merge_tables.main(2018, 12, 20, self.tmp_dir.name, False, output_format="csv")
+        df = pd.read_csv(
+            self.int_dir / "full_catgraph.csv", index_col="page_id", na_filter=False
+        )
+        self.assert_merged(df)
+
+    def test_merge_tables_chunks(self):
+        from wikicat.processing.merge_tables import merge_tables
+
+        page_path = self.write_csv("page.csv", PAGE_ROWS)
+        category_path = self.write_csv("categorylinks.csv", CATEGORY_ROWS)
+
+        self.assert_merged(merge_tables(page_path, category_path, chunksize=2))
+
+    def test_merge_tables_empty(self):
+        from wikicat.processing.merge_tables import merge_tables
+
+        page_path = self.write_csv("page.csv", PAGE_ROWS)
+        columns = ["page_namespace", "page_title", "cl_to", "cl_type"]
+
+        for rows in [CATEGORY_ROWS[:1], CATEGORY_ROWS[:1] + CATEGORY_ROWS[-1:]]:
+            category_path = self.write_csv("categorylinks.csv", rows)
+            df = merge_tables(page_path, category_path)
+            self.assertEqual(len(df), 0)
+            self.assertEqual(list(df.columns), columns)
+            self.assertEqual(df.index.name, "page_id")
+
+    @unittest.skipIf(find_spec("pyarrow") is None, "pyarrow is required for Parquet")
+    def test_merge_tables_parquet(self):
+        import pandas as pd
+        from wikicat.processing import merge_tables
+
+        for name, rows in [("page", PAGE_ROWS), ("categorylinks", CATEGORY_ROWS)]:
+            csv_path = self.write_csv(f"{name}.csv", rows)
+            pd.read_csv(csv_path, na_filter=False).to_parquet(
+                self.int_dir / f"{name}.parquet"
+            )
+
+        self.assert_merged(
+            merge_tables.merge_tables(
+                self.int_dir / "page.parquet",
+                self.int_dir / "categorylinks.parquet",
+                chunksize=2,
+            )
+        )
+
+        merge_tables.main(2018, 12, 20, self.tmp_dir.name, False)
+        self.assert_merged(pd.read_parquet(self.int_dir / "full_catgraph.parquet"))
+
+    @unittest.skipIf(find_spec("pyarrow") is None, "pyarrow is required for Parquet")
+    def test_merge_tables_empty_parquet(self):
+        import pandas as pd
+        from wikicat.processing.merge_tables import merge_tables
+
+        page_path = self.write_csv("page.csv", PAGE_ROWS)
+        category_path = self.int_dir / "categorylinks.parquet"
+        pd.DataFrame(
+            {"cl_from": [], "cl_to": [], "cl_type": []}, dtype="string"
+        ).astype({"cl_from": "int32"}).to_parquet(category_path)
+
+        df = merge_tables(page_path, category_path)
+        self.assertEqual(len(df), 0)
+        self.assertEqual(
+            list(df.columns), ["page_namespace", "page_title", "cl_to", "cl_type"]
+        )
+
+
+@unittest.skipIf(
+    find_spec("kwnlp_sql_parser") is None or find_spec("pyarrow") is None,
+    "kwnlp_sql_parser and pyarrow are required to write Parquet tables",
+)
+class TestProcessDump(unittest.TestCase):
+    def test_to_parquet(self):
+        import pandas as pd
+        from wikicat.processing.process_dump import process_dump
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            dumpfile = Path(tmp_dir, "enwiki-20181220-categorylinks.sql")
+            dumpfile.write_text(CATEGORY_DUMP)
+            output_filename = Path(tmp_dir, "categorylinks.parquet")
+
+            with redirect_stdout(io.StringIO()):
+                process_dump(
+                    dumpfile,
+                    output_filename,
+                    batch_size=2,
+                    keep_column_names=("cl_from", "cl_to", "cl_type"),
+                    decompressor="gzip",
+                )
+            df = pd.read_parquet(output_filename)
+
+        self.assertEqual(list(df.columns), ["cl_from", "cl_to", "cl_type"])
+        self.assertEqual(str(df["cl_from"].dtype), "int32")
+        self.assertEqual(list(df["cl_from"]), [1, 3, 3])
+        self.assertEqual(list(df["cl_to"]), ["Root", "Science", "NA"])
+        self.assertEqual(list(df["cl_type"]), ["subcat", "page", "page"])
+
+
+class TestDownloadDump(unittest.TestCase):
+    def setUp(self):
+        self.server = HTTPServer(("127.0.0.1", 0), DumpHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base_url = f"http://127.0.0.1:{self.server.server_port}/"
+
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.dump_dir = Path(self.tmp_dir.name, "enwiki_2018_12_20")
+        self.save_path = self.dump_dir / "enwiki-20181220-page.sql.gz"
+        self.part_path = self.dump_dir / "enwiki-20181220-page.sql.gz.part"
+
+    def tearDown(self):
+        DumpHandler.missing_bytes = 0
+        self.server.shutdown()
+        self.server.server_close()
+        self.tmp_dir.cleanup()
+
+    def download(self, **kwargs):
+        with redirect_stdout(io.StringIO()):
+            return download_dump(
+                2018,
+                12,
+                20,
+                self.tmp_dir.name,
+                "-page",
+                base_url=self.base_url,
+                **kwargs,
+            )
+
+    def test_truncated_download_is_resumed(self):
+        DumpHandler.missing_bytes = 100
+        with self.assertRaises(ContentTooShortError):
+            self.download()
+
+        self.assertFalse(self.save_path.exists())
+        self.assertEqual(self.part_path.stat().st_size, len(DUMP_CONTENT) - 100)
+
+        DumpHandler.missing_bytes = 0
+        self.assertEqual(self.download(), self.save_path)
+        self.assertEqual(self.save_path.read_bytes(), DUMP_CONTENT)
+        self.assertFalse(self.part_path.exists())
+
+    def test_complete_part_file(self):
+        self.dump_dir.mkdir(parents=True)
+        self.part_path.write_bytes(DUMP_CONTENT)
+
+        self.assertEqual(self.download(), self.save_path)
+        self.assertEqual(self.save_path.read_bytes(), DUMP_CONTENT)
+
+    def test_ignore_existing_part_file(self):
+        self.dump_dir.mkdir(parents=True)
+        self.part_path.write_bytes(b"stale")
+
+        self.assertEqual(self.download(ignore_existing=True), self.save_path)
+        self.assertEqual(self.save_path.read_bytes(), DUMP_CONTENT)
+        self.assertFalse(self.part_path.exists())
+
+    def test_oversized_part_file(self):
+        self.dump_dir.mkdir(parents=True)
+        self.part_path.write_bytes(DUMP_CONTENT + b"extra")
+
+        with self.assertRaises(HTTPError):
+            self.download()
+
+        self.assertFalse(self.save_path.exists())
+        self.assertTrue(self.part_path.exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,28 @@
+from contextlib import redirect_stderr
+from importlib.util import find_spec
+import io
+import unittest
+
+
+@unittest.skipIf(find_spec("dash") is None, "dash is required for the viewer")
+class TestViewerParser(unittest.TestCase):
+    def parse_debug(self, value):
+        from wikicat.viewer.__main__ import build_parser
+
+        args = ["-y", "2018", "-m", "12", "-d", "20", "--debug", value]
+        return build_parser().parse_args(args).debug
+
+    def test_debug(self):
+        for value in ["true", "True", "1", "yes"]:
+            self.assertIs(self.parse_debug(value), True)
+
+        for value in ["false", "False", "0", "no"]:
+            self.assertIs(self.parse_debug(value), False)
+
+        for value in ["Ture", "on", ""]:
+            with self.assertRaises(SystemExit), redirect_stderr(io.StringIO()):
+                self.parse_debug(value)
+
+
+if __name__ == "__main__":
+    unittest.main()
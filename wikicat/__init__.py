@@ -1,3 +1,11 @@
+from array import array
+from functools import lru_cache
+import heapq
+from itertools import filterfalse
+from operator import add, attrgetter, sub
+import os
+import sys
+from types import MappingProxyType
 from typing import Dict, List
 import unicodedata
 
@@ -6,6 +14,31 @@ from .version import __version__
 
 ACCEPTED_NAMESPACES = ("article", "category")
 
+_NORMALIZE = unicodedata.normalize
+
+# Maximum number of Page objects memoized by each CategoryGraph
+PAGE_CACHE_SIZE = 2**18
+
+# Version of the binary format used by CategoryGraph.read_json(..., csr_cache=True)
+CSR_CACHE_VERSION = 1
+
+# Every Page shares these namespace strings, so comparing them is a pointer check
+_ARTICLE_NS = sys.intern("article")
+_CATEGORY_NS = sys.intern("category")
+
+_NAMESPACE_TO_CODE = {
+    "article": ARTICLE,
+    "category": CATEGORY,
+    ARTICLE: ARTICLE,
+    CATEGORY: CATEGORY,
+}
+_CODE_TO_NAMESPACE = {
+    ARTICLE: _ARTICLE_NS,
+    CATEGORY: _CATEGORY_NS,
+    "article": _ARTICLE_NS,
+    "category": _CATEGORY_NS,
+}
+
 
 def _namespace_to_code(namespace: str) -> str:
     """
@@ -22,17 +55,15 @@ def _namespace_to_code(namespace: str) -> str:
     str
         The code of the namespace.
     """
-    if namespace == "article":
-        return ARTICLE
-    elif namespace == "category":
-        return CATEGORY
-    elif namespace in (ARTICLE, CATEGORY):
-        return namespace
-    else:
+    code = _NAMESPACE_TO_CODE.get(namespace)
+
+    if code is None:
         raise ValueError(
             f"Invalid namespace={namespace}. Must be one of: {ACCEPTED_NAMESPACES}."
         )
 
+    return code
+
 
 def _code_to_namespace(code: str) -> str:
     """
@@ -49,18 +80,17 @@ def _code_to_namespace(code: str) -> str:
     str
         The namespace of the code.
     """
-    code = str(code)
-
-    if code == ARTICLE:
-        return "article"
-    elif code == CATEGORY:
-        return "category"
-    elif code in ACCEPTED_NAMESPACES:
-        return code
-    else:
+    namespace = _CODE_TO_NAMESPACE.get(str(code))
+
+    if namespace is None:
         raise ValueError(f"Invalid code={code}")
 
+    return namespace
+
 
+# The same titles tend to be looked up repeatedly (e.g. when navigating the viewer),
+# so the most recent ones are memoized
+@lru_cache(maxsize=2**17)
 def standardize(title: str, form: str = "NFC"):
     """
     Standardizes a title by replacing spaces with underscores and normalizing it to
@@ -73,16 +103,266 @@ def standardize(title: str, form: str = "NFC"):
     form
         The form to normalize the title to. Defaults to NFC.
     """
-    return unicodedata.normalize(form, title.replace(" ", "_"))
+    title = title.replace(" ", "_")
+
+    # ASCII strings are unchanged by every normalization form
+    if title.isascii():
+        return title
+
+    return _NORMALIZE(form, title)
+
+
+def standardize_many(titles: "list[str]", form: str = "NFC") -> "list[str]":
+    """
+    Standardizes multiple titles at once. This is equivalent to calling `standardize`
+    on each title, but is faster for large numbers of titles.
+
+    Parameters
+    ----------
+    titles
+        The titles to standardize.
+    form
+        The form to normalize the titles to. Defaults to NFC.
+
+    Returns
+    -------
+    list of str
+        The standardized titles, in the same order as the input.
+    """
+    # Titles are often repeated (e.g. the parent category of every link in a dump),
+    # so each distinct title is only standardized once
+    unique_titles = list(dict.fromkeys(titles))
+    standardized = [title.replace(" ", "_") for title in unique_titles]
+    standardized = [
+        title if title.isascii() else _NORMALIZE(form, title) for title in standardized
+    ]
+
+    if len(unique_titles) == len(titles):
+        return standardized
+
+    mapping = dict(zip(unique_titles, standardized))
+    return list(map(mapping.__getitem__, titles))
+
+
+def _build_csr(adjacency: dict, dense_to_id: list, id_to_dense: dict):
+    """
+    Converts an adjacency mapping of {<id>: "<id> <id> ..."} or {<id>: [<id>, ...]}
+    into a compressed sparse row (CSR) representation over dense integer indices. The
+    neighbors of the page at dense index i are neighbors[offsets[i]:offsets[i + 1]].
+
+    Parameters
+    ----------
+    adjacency
+        The mapping of IDs to their neighbor IDs, as stored in the JSON. The neighbors
+        are either space-separated in a string, or in a list of ints or strings.
+    dense_to_id
+        The ID of the page at each dense index.
+    id_to_dense
+        The dense index of each ID.
+
+    Returns
+    -------
+    tuple of array
+        The offsets and neighbors arrays.
+    """
+    offsets = array("q", [0])
+    neighbors = array("i")
+
+    for id_ in dense_to_id:
+        row = _split_row(adjacency.get(id_, ""))
+        neighbors.extend(map(id_to_dense.__getitem__, row))
+        offsets.append(len(neighbors))
+
+    return offsets, neighbors
+
+
+def _split_row(row) -> "list[str]":
+    # The neighbors of a page in the JSON are either space-separated in a string, or
+    # in a list of ints or strings
+    return row.split() if isinstance(row, str) else list(map(str, row))
+
+
+def _filter_csr(offsets: array, neighbors: array, mask: bytearray):
+    """
+    Removes the neighbors whose dense index is set in a mask from a CSR adjacency
+    (see _build_csr).
+
+    Parameters
+    ----------
+    offsets
+        The offsets array of the CSR adjacency.
+    neighbors
+        The neighbors array of the CSR adjacency.
+    mask
+        The mask of dense indices to remove.
+
+    Returns
+    -------
+    tuple of array
+        The offsets and neighbors arrays of the filtered CSR adjacency.
+    """
+    filtered_offsets = array("q", [0])
+    filtered_neighbors = array("i")
+    is_masked = mask.__getitem__
+
+    for start, end in zip(offsets, offsets[1:]):
+        filtered_neighbors.extend(filterfalse(is_masked, neighbors[start:end]))
+        filtered_offsets.append(len(filtered_neighbors))
+
+    return filtered_offsets, filtered_neighbors
+
+
+def _csr_to_adjacency(offsets: array, neighbors: array, dense_to_id: list) -> dict:
+    """
+    Converts a CSR adjacency (see _build_csr) back into the mapping of
+    {<id>: "<id> <id> ..."} stored in the JSON. Pages without neighbors are omitted.
+
+    Parameters
+    ----------
+    offsets
+        The offsets array of the CSR adjacency.
+    neighbors
+        The neighbors array of the CSR adjacency.
+    dense_to_id
+        The ID of the page at each dense index.
+
+    Returns
+    -------
+    dict
+        The mapping of IDs to their space-separated neighbor IDs.
+    """
+    adjacency = {}
+    id_of = dense_to_id.__getitem__
+
+    for dense_id, (begin, end) in enumerate(zip(offsets, offsets[1:])):
+        if begin != end:
+            adjacency[dense_to_id[dense_id]] = " ".join(
+                map(id_of, neighbors[begin:end])
+            )
+
+    return adjacency
+
+
+def _count_neighbors(offsets: array) -> array:
+    """
+    Counts the number of neighbors of each page in a CSR adjacency (see _build_csr).
+
+    Parameters
+    ----------
+    offsets
+        The offsets array of the CSR adjacency.
+
+    Returns
+    -------
+    array
+        The number of neighbors of each page, indexed by dense index.
+    """
+    return array("i", map(sub, offsets[1:], offsets[:-1]))
+
+
+def _bfs_csr(offsets: array, neighbors: array, sources: "list[int]", max_depth: int):
+    """
+    Runs a breadth-first search from multiple sources over a CSR adjacency (see
+    _build_csr). The queue is a single flat array, where each level is appended after
+    the previous one, so no per-node objects are allocated during the search.
+
+    Parameters
+    ----------
+    offsets
+        The offsets array of the CSR adjacency.
+    neighbors
+        The neighbors array of the CSR adjacency.
+    sources
+        The dense indices to start the search from. They are marked as visited
+        before the search starts.
+    max_depth
+        The number of levels to expand.
+
+    Returns
+    -------
+    tuple of (array, list of int)
+        The dense indices of the sources followed by the pages in the order they were
+        reached, and the boundaries of each level in that array: the pages at depth
+        k are order[boundaries[k - 1]:boundaries[k]], with depth 0 being the sources.
+    """
+    visited = bytearray(len(offsets) - 1)
+    order = array("i")
+
+    for source in sources:
+        if not visited[source]:
+            visited[source] = 1
+            order.append(source)
+
+    boundaries = [len(order)]
+    head = 0
+
+    # slicing a memoryview iterates over the row in place instead of copying it
+    with memoryview(neighbors) as neighbors_view:
+        for depth in range(max_depth):
+            tail = len(order)
+
+            # once a level is empty, all the following levels are empty as well
+            if head == tail:
+                boundaries.extend([tail] * (max_depth - depth))
+                break
+
+            for i in range(head, tail):
+                dense_id = order[i]
+                row = neighbors_view[offsets[dense_id] : offsets[dense_id + 1]]
+
+                for neighbor in row:
+                    if not visited[neighbor]:
+                        visited[neighbor] = 1
+                        order.append(neighbor)
+
+            head = tail
+            boundaries.append(len(order))
+
+    return order, boundaries
+
+
+def _as_str_values(mapping: dict) -> dict:
+    # The IDs in title_to_id are ints if the graph was generated from an integer
+    # column, unlike the JSON keys which are always strings. They are converted once
+    # here so that the lookups do not need to coerce every ID they return.
+    if all(type(value) is str for value in mapping.values()):
+        return mapping
+
+    return {key: str(value) for key, value in mapping.items()}
+
+
+def _validate_exactly_one(page, id, title):
+    """
+    Checks that exactly one of page, id and title is given (i.e. is not None).
+
+    Parameters
+    ----------
+    page
+        The page argument of a CategoryGraph method.
+    id
+        The id argument of a CategoryGraph method.
+    title
+        The title argument of a CategoryGraph method.
+    """
+    total_not_none = (page is not None) + (id is not None) + (title is not None)
+
+    if total_not_none != 1:
+        raise ValueError(
+            f"Must give exactly one of page, id, title. {total_not_none} were given."
+        )
 
 
 class Page:
+    __slots__ = ("id", "title", "namespace", "display_title")
+
     def __init__(
         self, id: str, title: str, namespace: str, standardize_title: bool = True
     ):
         """
         Represents a Wikipedia page. It should be used alongside CategoryGraph to
         represent a page in the graph. You can also use it to find the URL of a page.
+        The title with spaces instead of underscores, as it is displayed on Wikipedia,
+        is available as `display_title`.
 
         Parameters
         ----------
@@ -118,11 +398,25 @@ class Page:
         if standardize_title:
             self.title = standardize(self.title)
 
+        self.display_title = self.title.replace("_", " ")
+
         if self.namespace not in ACCEPTED_NAMESPACES:
             raise ValueError(
                 f"Incorrect namespace={self.namespace}. Must be one of: {ACCEPTED_NAMESPACES}"
             )
 
+    @classmethod
+    def _from_trusted(cls, id: str, title: str, namespace: str) -> "Page":
+        # Used by CategoryGraph, whose titles are already standardized, to skip the
+        # standardization and validation in __init__. namespace must be _ARTICLE_NS
+        # or _CATEGORY_NS.
+        page = cls.__new__(cls)
+        page.id = id
+        page.title = title
+        page.namespace = namespace
+        page.display_title = title.replace("_", " ")
+        return page
+
     def __repr__(self):
         """
         Returns
@@ -147,7 +441,7 @@ class Page:
         bool
             Whether the page is a category.
         """
-        return self.namespace == "category"
+        return self.namespace == _CATEGORY_NS
 
     def is_article(self) -> bool:
         """
@@ -156,7 +450,7 @@ class Page:
         bool
             Whether the page is an article.
         """
-        return self.namespace == "article"
+        return self.namespace == _ARTICLE_NS
 
     def get_url(self, use_curid: bool = False) -> str:
         """
@@ -221,27 +515,423 @@ class CategoryGraph:
         >>> # Get URL of "Montreal"
         >>> print("URL:", page.get_url())
         """
+        self._set_pages(graph_json)
+
+        # The adjacency of each direction is only converted to a CSR the first time it
+        # is used (see _get_csr), so loading the graph does not pay for the directions
+        # that are never used
+        self._json_adjacency: dict = {
+            "children": graph_json["parents_to_children"],
+            "parents": graph_json["children_to_parents"],
+        }
+        self._adjacency: dict = {}
+
+        # Same as _adjacency, without the hidden categories, for include_hidden=False
+        self._visible_adjacency: dict = {}
+
+        # The hidden mask is read from the JSON row of "Hidden_categories", so that
+        # the children CSR does not need to be built
+        hidden_id = self.title_to_id[CATEGORY]["Hidden_categories"]
+        hidden_row = self._json_adjacency["children"].get(hidden_id, "")
+        self._hidden_mask = bytearray(len(self._dense_to_id))
+        for id_ in _split_row(hidden_row):
+            self._hidden_mask[self._id_to_dense[id_]] = 1
+
+        self._set_caches()
+
+    def _set_pages(self, graph_json: dict):
         self.id_to_title: dict = graph_json["id_to_title"]
         self.id_to_namespace: dict = graph_json["id_to_namespace"]
-        self.title_to_id: dict = graph_json["title_to_id"]
-        self.children_to_parents: dict = graph_json["children_to_parents"]
-        self.parents_to_children: dict = graph_json["parents_to_children"]
+        self.title_to_id: dict = {
+            code: _as_str_values(titles)
+            for code, titles in graph_json["title_to_id"].items()
+        }
+
+        # Each page gets a dense index, which is used to store the adjacency lists
+        # in a CSR format instead of space-separated strings (see _build_csr)
+        self._dense_to_id: list = list(self.id_to_title)
+        self._id_to_dense: dict = {id_: i for i, id_ in enumerate(self._dense_to_id)}
+        self._dense_to_title: list = list(self.id_to_title.values())
+
+    def _set_caches(self):
+        # The set of hidden category IDs is only built if it is accessed (see the
+        # hidden_categories property); the graph itself only uses the mask
+        self._hidden_categories: frozenset = None
+
+        # Degree arrays indexed by dense index, keyed by include_hidden
+        self._degree_arrays: dict = {}
+
+        # Mappings of IDs to degrees returned by get_degree_counts, keyed by
+        # include_hidden
+        self._degree_counts: dict = {}
+
+        # Adjacency mappings in the JSON format, keyed by direction (see the
+        # parents_to_children and children_to_parents properties)
+        self._adjacency_mappings: dict = {}
+
+        # ID of each title across all namespaces (see _get_title_to_any_id)
+        self._title_to_any_id: dict = None
+
+        # Whether each dense index is an article (see _get_article_mask)
+        self._article_mask: bytearray = None
+
+        # Pages are memoized by dense index, so repeated lookups of the same page (e.g.
+        # overlapping traversals) return the same object instead of building a new one
+        self._get_page_from_dense_id = lru_cache(maxsize=PAGE_CACHE_SIZE)(
+            self._build_page_from_dense_id
+        )
 
-        hidden_id = str(self.title_to_id[CATEGORY]["Hidden_categories"])
-        self.hidden_categories = frozenset(self.parents_to_children[hidden_id].split())
+    def _iter_csr_arrays(self):
+        # The order in which the CSR arrays are stored in the CSR cache file
+        for include_hidden in (True, False):
+            for direction in ("children", "parents"):
+                yield from self._get_csr(direction, include_hidden)
+
+    def _write_csr_cache(self, cache_path: str, source_key: list):
+        """
+        Writes the CSR arrays and the hidden mask to a binary file, so that they can
+        be loaded by _read_csr_cache instead of being rebuilt from the JSON.
+
+        Parameters
+        ----------
+        cache_path
+            The path of the cache file.
+        source_key
+            The size and modification time of the JSON file the graph was read from,
+            used to detect when the cache is stale.
+        """
+        import json
+
+        arrays = list(self._iter_csr_arrays())
+        header = {
+            "version": CSR_CACHE_VERSION,
+            "source": source_key,
+            "byteorder": sys.byteorder,
+            "itemsizes": [arr.itemsize for arr in arrays],
+            "lengths": [len(arr) for arr in arrays],
+            "num_pages": len(self._dense_to_id),
+        }
+
+        # write to a temporary file first, so an interrupted write is never read
+        tmp_path = f"{cache_path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(json.dumps(header).encode() + b"\n")
+            for arr in arrays:
+                arr.tofile(f)
+            f.write(self._hidden_mask)
+
+        os.replace(tmp_path, cache_path)
+
+    def _read_csr_cache(
+        self, graph_json: dict, cache_path: str, source_key: list
+    ) -> bool:
+        """
+        Initializes the graph from the JSON for the pages and from a file written by
+        _write_csr_cache for the CSR arrays and hidden mask.
 
-    def __autoconvert_list_of_ids(self, ids, return_as):
+        Parameters
+        ----------
+        graph_json
+            The JSON object containing the category graph.
+        cache_path
+            The path of the cache file.
+        source_key
+            The size and modification time of the JSON file, which must match the
+            ones stored in the cache file.
+
+        Returns
+        -------
+        bool
+            Whether the cache was valid. If False, then the graph is not initialized.
+        """
+        import json
+
+        if not os.path.exists(cache_path):
+            return False
+
+        self._set_pages(graph_json)
+        num_pages = len(self._dense_to_id)
+
+        with open(cache_path, "rb") as f:
+            try:
+                header = json.loads(f.readline())
+            except ValueError:
+                return False
+
+            # typecodes follow _build_csr: offsets then neighbors, for each CSR
+            arrays = [array(typecode) for typecode in "qiqiqiqi"]
+            expected_header = {
+                "version": CSR_CACHE_VERSION,
+                "source": source_key,
+                "byteorder": sys.byteorder,
+                "itemsizes": [arr.itemsize for arr in arrays],
+                "num_pages": num_pages,
+            }
+            if any(header.get(k) != v for k, v in expected_header.items()):
+                return False
+
+            try:
+                for arr, length in zip(arrays, header["lengths"]):
+                    arr.fromfile(f, length)
+            except EOFError:
+                return False
+
+            hidden_mask = bytearray(f.read())
+            if len(hidden_mask) != num_pages:
+                return False
+
+        self._json_adjacency = {}
+        self._adjacency = {
+            "children": tuple(arrays[0:2]),
+            "parents": tuple(arrays[2:4]),
+        }
+        self._visible_adjacency = {
+            "children": tuple(arrays[4:6]),
+            "parents": tuple(arrays[6:8]),
+        }
+        self._hidden_mask = hidden_mask
+        self._set_caches()
+
+        return True
+
+    @property
+    def hidden_categories(self) -> frozenset:
+        """
+        Returns
+        -------
+        frozenset of str
+            The IDs of the hidden categories, i.e. the children of the category
+            "Hidden_categories".
+        """
+        if self._hidden_categories is None:
+            self._hidden_categories = frozenset(
+                id_
+                for id_, is_hidden in zip(self._dense_to_id, self._hidden_mask)
+                if is_hidden
+            )
+
+        return self._hidden_categories
+
+    @property
+    def parents_to_children(self) -> MappingProxyType:
+        """
+        Returns
+        -------
+        mapping of str to str
+            The space-separated IDs of the children of each page, in the format of the
+            released graph JSON files. It is a read-only view derived from the adjacency
+            arrays of the graph (built on the first access), so modifying the graph
+            through it is not possible, and `get_children` should be used to look up
+            individual pages.
+        """
+        return self._get_adjacency_mapping("children")
+
+    @property
+    def children_to_parents(self) -> MappingProxyType:
+        """
+        Returns
+        -------
+        mapping of str to str
+            The space-separated IDs of the parents of each page, in the format of the
+            released graph JSON files. It is a read-only view derived from the adjacency
+            arrays of the graph (built on the first access), so modifying the graph
+            through it is not possible, and `get_parents` should be used to look up
+            individual pages.
+        """
+        return self._get_adjacency_mapping("parents")
+
+    def _get_adjacency_mapping(self, direction: str) -> MappingProxyType:
+        if direction not in self._adjacency_mappings:
+            self._adjacency_mappings[direction] = MappingProxyType(
+                _csr_to_adjacency(
+                    *self._get_csr(direction, include_hidden=True), self._dense_to_id
+                )
+            )
+
+        return self._adjacency_mappings[direction]
+
+    def __autoconvert_dense_ids(self, dense_ids, return_as):
         if return_as == "title":
-            return [self.id_to_title[str(parent_id)] for parent_id in ids]
+            return list(map(self._dense_to_title.__getitem__, dense_ids))
         elif return_as == "id":
-            return ids
+            return list(map(self._dense_to_id.__getitem__, dense_ids))
         elif return_as == "page":
-            return [self.get_page_from_id(parent_id) for parent_id in ids]
+            return list(map(self._get_page_from_dense_id, dense_ids))
         else:
             raise ValueError(
                 f"return_as={return_as} is invalid. It should be one of: 'title', 'id', 'page'."
             )
 
+    def _build_page_from_dense_id(self, dense_id: int) -> Page:
+        # The namespace is only needed when a page is built, so it is read from
+        # id_to_namespace here instead of being stored per dense index
+        id_ = self._dense_to_id[dense_id]
+        namespace_code = self.id_to_namespace.get(id_)
+
+        if namespace_code is None:
+            raise ValueError(f"Could not determine the type of Page with ID={id_}.")
+
+        # raises the error for an invalid code
+        namespace = _code_to_namespace(namespace_code)
+
+        return Page._from_trusted(id_, self._dense_to_title[dense_id], namespace)
+
+    def _get_pages_from_ids(self, ids: "list[str]") -> "list[Page]":
+        id_to_dense = self._id_to_dense
+        pages = []
+
+        for id_ in ids:
+            dense_id = id_to_dense.get(str(id_))
+            if dense_id is None:
+                raise ValueError(f"Page with ID={id_} was not found in the graph.")
+            pages.append(self._get_page_from_dense_id(dense_id))
+
+        return pages
+
+    def _get_neighbors_as(
+        self,
+        page_id: str,
+        direction: str,
+        include_hidden: bool,
+        return_as: str,
+        neighbor_namespace: str = None,
+    ) -> list:
+        # Reads the CSR row of a page and converts it to the requested format in a
+        # single pass, without copying the row or building an intermediate list of IDs
+        dense_id = self._id_to_dense.get(page_id)
+        if dense_id is None:
+            return self.__autoconvert_dense_ids((), return_as)
+
+        offsets, neighbors = self._get_csr(direction, include_hidden)
+
+        # the view must be released, otherwise the CSR cannot be appended to
+        with memoryview(neighbors)[offsets[dense_id] : offsets[dense_id + 1]] as row:
+            dense_ids = row
+            if neighbor_namespace is not None:
+                # the row is filtered before anything is built for the other pages
+                is_article = self._get_article_mask().__getitem__
+                if _namespace_to_code(neighbor_namespace) == ARTICLE:
+                    dense_ids = filter(is_article, row)
+                else:
+                    dense_ids = filterfalse(is_article, row)
+
+            return self.__autoconvert_dense_ids(dense_ids, return_as)
+
+    def _get_article_mask(self) -> bytearray:
+        # Built on first use like the hidden mask, from id_to_namespace, so that the
+        # neighbors of a page can be filtered by namespace without building pages
+        if self._article_mask is None:
+            id_to_namespace = self.id_to_namespace
+            self._article_mask = bytearray(
+                id_to_namespace[id_] == ARTICLE for id_ in self._dense_to_id
+            )
+
+        return self._article_mask
+
+    def _get_title_to_any_id(self) -> dict:
+        # Flattens title_to_id into a single {title: id} mapping, so a title can be
+        # found without knowing its namespace in a single lookup. If a title exists in
+        # multiple namespaces, the article namespace takes precedence. This is built
+        # on first use, since it is only needed when the namespace is unknown.
+        if self._title_to_any_id is None:
+            title_to_any_id = {}
+            for code, titles in self.title_to_id.items():
+                if code != ARTICLE:
+                    title_to_any_id.update(titles)
+            title_to_any_id.update(self.title_to_id.get(ARTICLE, {}))
+
+            self._title_to_any_id = title_to_any_id
+
+        return self._title_to_any_id
+
+    def _get_csr(self, direction: str, include_hidden: bool) -> "tuple[array]":
+        if direction not in self._adjacency:
+            # the JSON adjacency is released once it has been converted
+            csr = _build_csr(
+                self._json_adjacency.pop(direction),
+                self._dense_to_id,
+                self._id_to_dense,
+            )
+            self._adjacency[direction] = csr
+
+        if include_hidden:
+            return self._adjacency[direction]
+
+        # the hidden categories are only filtered out the first time they are excluded
+        if direction not in self._visible_adjacency:
+            self._visible_adjacency[direction] = _filter_csr(
+                *self._adjacency[direction], self._hidden_mask
+            )
+
+        return self._visible_adjacency[direction]
+
+    def _append_page(
+        self,
+        id: str,
+        title: str,
+        namespace: str,
+        parent_ids: "list[str]" = (),
+        child_ids: "list[str]" = (),
+    ):
+        # Adds a page at the end of the CSR adjacency. Only the adjacency of the new
+        # page is set; the parents and children it links to are left unchanged.
+        if id in self._id_to_dense:
+            raise ValueError(f"Page with ID={id} is already in the graph.")
+
+        # the CSRs are built before the page is added, since the JSON adjacency does
+        # not contain the new page
+        for direction in ("parents", "children"):
+            self._get_csr(direction, include_hidden=True)
+
+        namespace_code = _namespace_to_code(namespace)
+        self.id_to_title[id] = title
+        self.id_to_namespace[id] = namespace_code
+        self.title_to_id[namespace_code][title] = id
+        if self._title_to_any_id is not None and (
+            namespace_code == ARTICLE or title not in self._title_to_any_id
+        ):
+            self._title_to_any_id[title] = id
+
+        self._degree_arrays.clear()
+        self._degree_counts.clear()
+        self._adjacency_mappings.clear()
+        self._id_to_dense[id] = len(self._dense_to_id)
+        self._dense_to_id.append(id)
+        self._dense_to_title.append(title)
+        self._hidden_mask.append(0)
+        if self._article_mask is not None:
+            self._article_mask.append(namespace_code == ARTICLE)
+
+        for direction, ids in [("parents", parent_ids), ("children", child_ids)]:
+            dense_ids = [self._id_to_dense[i] for i in ids]
+
+            offsets, neighbors = self._adjacency[direction]
+            neighbors.extend(dense_ids)
+            offsets.append(len(neighbors))
+
+            # if it is not built yet, it will be filtered from the row added above
+            if direction in self._visible_adjacency:
+                offsets, neighbors = self._visible_adjacency[direction]
+                neighbors.extend([i for i in dense_ids if not self._hidden_mask[i]])
+                offsets.append(len(neighbors))
+
+    def _get_degree_array(
+        self, include_hidden: bool = False, use_cache: bool = True
+    ) -> array:
+        if use_cache and include_hidden in self._degree_arrays:
+            return self._degree_arrays[include_hidden]
+
+        parent_offsets, _ = self._get_csr("parents", include_hidden)
+        child_offsets, _ = self._get_csr("children", include_hidden)
+
+        # The degree of a page is the sum of its row lengths in both CSRs, which is
+        # the same as the row length in the element-wise sum of the offsets, so the
+        # per-direction counts do not need to be materialized
+        degrees = _count_neighbors(array("q", map(add, parent_offsets, child_offsets)))
+        self._degree_arrays[include_hidden] = degrees
+
+        return degrees
+
     def _autodetect_id(
         self,
         page: Page,
@@ -252,36 +942,44 @@ class CategoryGraph:
         namespace: str = None,
     ):
         if not skip_error_checking:
-            total_not_none = sum(x is not None for x in [page, id, title])
-            if total_not_none == 0 or total_not_none > 1:
-                raise ValueError(
-                    f"Must give exactly one of page, id, title. {total_not_none} were given."
-                )
+            _validate_exactly_one(page, id, title)
 
         if page is not None:
             return page.id
 
-        elif id is not None:
-            return str(id)
+        if id is not None:
+            return id if type(id) is str else str(id)
 
-        elif title is not None:
+        if title is not None:
             if standardize_title:
                 title = standardize(title)
 
             if namespace is None:
-                if title in self.title_to_id[ARTICLE]:
-                    namespace = "article"
-                elif title in self.title_to_id[CATEGORY]:
-                    namespace = "category"
+                id_ = self._get_title_to_any_id().get(title)
+                if id_ is not None:
+                    return id_
+
+            # also raises the error if the title was not found in any namespace
+            return self._get_id_from_title(title, namespace)
+
+    def _get_id_from_title(self, title: str, namespace: str) -> str:
+        # title must already be standardized
+        namespace_code = _namespace_to_code(namespace)
+        titles = self.title_to_id.get(namespace_code)
 
-            page = self.get_page_from_title(
-                title, standardize_title=False, namespace=namespace
+        if titles is None:
+            raise ValueError(
+                f"namespace={namespace} is invalid. It should be one of {ACCEPTED_NAMESPACES}."
             )
 
-            return page.id
+        id_ = titles.get(title)
+        if id_ is None:
+            raise ValueError(f"Title {title} not found in graph.")
+
+        return id_
 
     @classmethod
-    def read_json(cls, path: str):
+    def read_json(cls, path: str, csr_cache: bool = False):
         """
         Loads the category graph from a JSON file.
 
@@ -289,25 +987,38 @@ class CategoryGraph:
         ----------
         path
             The path to the JSON file containing the category graph.
+        csr_cache
+            Whether to cache the adjacency of the graph in a binary file next to the
+            JSON file (with the ".csr" suffix). If the cache file exists and matches
+            the JSON file, then the adjacency is loaded from it instead of being
+            rebuilt, which is much faster. Otherwise, it is created.
 
         Examples
         --------
         >>> import wikicat as wc
         >>> graph = wc.CategoryGraph.read_json("category_graph_<yyyy>_<mm>_<dd>.json")
 
+        >>> # The second time, the adjacency is loaded from the .csr file
+        >>> graph = wc.CategoryGraph.read_json("category_graph.json", csr_cache=True)
+
         Notes
         -----
         This method uses orjson if it is available, otherwise it uses the standard json module.
-        You can install orjson with `pip install orjson`.
+        You can install orjson with `pip install orjson` (or `pip install wikicat[fast]`).
 
         """
         from importlib.util import find_spec
 
         if find_spec("orjson") is not None:
+            import mmap
             import orjson
 
-            with open(path, "rb") as f:
-                graph_json = orjson.loads(f.read())
+            # orjson can parse the memory-mapped file directly, so the whole file is
+            # never copied into a bytes object (which would double the peak memory)
+            with open(path, "rb") as f, mmap.mmap(
+                f.fileno(), 0, access=mmap.ACCESS_READ
+            ) as buf, memoryview(buf) as view:
+                graph_json = orjson.loads(view)
 
         else:
             import json
@@ -315,7 +1026,21 @@ class CategoryGraph:
             with open(path) as f:
                 graph_json = json.load(f)
 
-        return cls(graph_json)
+        if not csr_cache:
+            return cls(graph_json)
+
+        stat = os.stat(path)
+        source_key = [stat.st_size, stat.st_mtime_ns]
+        cache_path = f"{path}.csr"
+
+        graph = cls.__new__(cls)
+        if graph._read_csr_cache(graph_json, cache_path, source_key):
+            return graph
+
+        graph = cls(graph_json)
+        graph._write_csr_cache(cache_path, source_key)
+
+        return graph
 
     def remove_hidden_ids(self, ids: "list[str]") -> "list[str]":
         """
@@ -329,7 +1054,7 @@ class CategoryGraph:
         list of str
             The list of IDs with hidden categories removed.
         """
-        return [id_ for id_ in ids if id_ not in self.hidden_categories]
+        return list(filterfalse(self.hidden_categories.__contains__, ids))
 
     def contains_id(self, id: str) -> bool:
         """
@@ -391,10 +1116,7 @@ class CategoryGraph:
             namespace_code = _namespace_to_code(namespace)
             return title in self.title_to_id[namespace_code]
         else:
-            for namespace_code in self.title_to_id:
-                if title in self.title_to_id[namespace_code]:
-                    return True
-            return False
+            return title in self._get_title_to_any_id()
 
     def get_page_from_id(self, id: str) -> Page:
         """
@@ -413,15 +1135,13 @@ class CategoryGraph:
         >>> cg.get_page_from_id("7954681")
         Page(id="7954681", title="Montreal", namespace="article")
         """
-        id = str(id)
-        if id not in self.id_to_title:
+        if type(id) is not str:
+            id = str(id)
+        dense_id = self._id_to_dense.get(id)
+        if dense_id is None:
             raise ValueError(f"Page with ID={id} was not found in the graph.")
-        if id not in self.id_to_namespace:
-            raise ValueError(f"Could not determine the type of Page with ID={id}.")
 
-        return Page(
-            id=id, title=self.id_to_title[id], namespace=self.id_to_namespace[id]
-        )
+        return self._get_page_from_dense_id(dense_id)
 
     def get_page_from_title(
         self, title: str, namespace: str, standardize_title=True
@@ -453,17 +1173,7 @@ class CategoryGraph:
         if standardize_title:
             title = standardize(title)
 
-        namespace_code = _namespace_to_code(namespace)
-
-        if namespace_code not in self.title_to_id:
-            raise ValueError(
-                f"namespace={namespace} is invalid. It should be one of {ACCEPTED_NAMESPACES}."
-            )
-
-        if title not in self.title_to_id[namespace_code]:
-            raise ValueError(f"Title {title} not found in graph.")
-        id = self.title_to_id[namespace_code][title]
-        return self.get_page_from_id(id)
+        return self.get_page_from_id(self._get_id_from_title(title, namespace))
 
     def get_children(
         self,
@@ -473,6 +1183,7 @@ class CategoryGraph:
         return_as: str = "page",
         include_hidden: bool = False,
         standardize_title: bool = True,
+        child_namespace: str = None,
     ):
         """
         Get the children of a category page.
@@ -496,6 +1207,11 @@ class CategoryGraph:
         standardize_title
             Whether to standardize the title before searching for it. Only applies
             if title is given.
+        child_namespace
+            If given, only the children in this namespace ('article' or 'category')
+            are returned. This is the namespace of the children, not of the page
+            (which is always a category). The other children are skipped before they
+            are converted to the format specified by return_as.
 
         Returns
         -------
@@ -519,12 +1235,14 @@ class CategoryGraph:
         page_id = self._autodetect_id(
             page, id, title, standardize_title=standardize_title, namespace="category"
         )
-        parent_ids = self.parents_to_children.get(page_id, "").split()
 
-        if not include_hidden:
-            parent_ids = self.remove_hidden_ids(parent_ids)
-
-        return self.__autoconvert_list_of_ids(parent_ids, return_as)
+        return self._get_neighbors_as(
+            page_id,
+            "children",
+            include_hidden,
+            return_as,
+            neighbor_namespace=child_namespace,
+        )
 
     def get_parents(
         self,
@@ -590,12 +1308,8 @@ class CategoryGraph:
         page_id = self._autodetect_id(
             page, id, title, standardize_title=standardize_title, namespace=namespace
         )
-        child_ids = self.children_to_parents.get(page_id, "").split()
 
-        if not include_hidden:
-            child_ids = self.remove_hidden_ids(child_ids)
-
-        return self.__autoconvert_list_of_ids(child_ids, return_as)
+        return self._get_neighbors_as(page_id, "parents", include_hidden, return_as)
 
     def get_degree_counts(
         self, include_hidden: bool = False, use_cache: bool = True
@@ -622,27 +1336,13 @@ class CategoryGraph:
         >>> counts['808487']  # Montreal
         10
         """
-        # Check if cached
-        if use_cache and hasattr(self, "degree_counts"):
-            return self.degree_counts
-
-        # if not cached, compute and cache
-        self.degree_counts = {}
-
-        for id_ in self.id_to_title:
-            parents = self.children_to_parents.get(id_, "").split()
-            children = self.parents_to_children.get(id_, "").split()
-
-            if not include_hidden:
-                parents = self.remove_hidden_ids(parents)
-                children = self.remove_hidden_ids(children)
+        if use_cache and include_hidden in self._degree_counts:
+            return self._degree_counts[include_hidden]
 
-            num_children = len(children)
-            num_parents = len(parents)
+        degrees = self._get_degree_array(include_hidden, use_cache=use_cache)
+        self._degree_counts[include_hidden] = dict(zip(self._dense_to_id, degrees))
 
-            self.degree_counts[id_] = num_parents + num_children
-
-        return self.degree_counts
+        return self._degree_counts[include_hidden]
 
     def rank_page_ids(
         self,
@@ -687,11 +1387,20 @@ class CategoryGraph:
                 f"mode={mode} is invalid. Only 'degree' is currently supported."
             )
 
-        counts = self.get_degree_counts()
-        ranked = sorted(ids, key=lambda page_id: counts[page_id], reverse=not ascending)
-        if max_pages is not None:
-            ranked = ranked[:max_pages]
-        return self.__autoconvert_list_of_ids(ranked, return_as)
+        degrees = self._get_degree_array()
+        dense_ids = list(map(self._id_to_dense.__getitem__, ids))
+        key = degrees.__getitem__
+
+        # For the top-k pages, a heap selection is O(n log k) instead of a full sort.
+        # heapq's nlargest/nsmallest are equivalent to the stable sort followed by
+        # a slice, so ties keep the same order.
+        if max_pages is not None and 0 <= max_pages < len(dense_ids):
+            select = heapq.nsmallest if ascending else heapq.nlargest
+            ranked = select(max_pages, dense_ids, key=key)
+        else:
+            ranked = sorted(dense_ids, key=key, reverse=not ascending)[:max_pages]
+
+        return self.__autoconvert_dense_ids(ranked, return_as)
 
     def rank_pages(
         self,
@@ -730,15 +1439,14 @@ class CategoryGraph:
          Page(id="25645154", title="1990s_fads_and_trends", namespace="category"),
          Page(id="4583997", title="Computers", namespace="category")]
         """
-        ranked_ids = self.rank_page_ids(
+        return self.rank_page_ids(
             [page.id for page in pages],
             mode=mode,
             ascending=ascending,
             max_pages=max_pages,
+            return_as="page",
         )
 
-        return [self.get_page_from_id(page_id) for page_id in ranked_ids]
-
     def format_page_ids(
         self, ids: "list[str]", sep: str = "; ", replace_underscores: bool = True
     ) -> str:
@@ -765,7 +1473,7 @@ class CategoryGraph:
         >>> cg.format_page_ids(page_ids)
         'Consumer electronics; Computers; 2000s fads and trends; 1990s fads and trends'
         """
-        pages = [self.get_page_from_id(id_) for id_ in ids]
+        pages = self._get_pages_from_ids(ids)
         return self.format_pages(
             pages, sep=sep, replace_underscores=replace_underscores
         )
@@ -797,11 +1505,10 @@ class CategoryGraph:
         >>> cg.format_pages(pages)
         'Consumer electronics; Computers; 2000s fads and trends; 1990s fads and trends'
         """
-        titles = [page.title for page in pages]
-
         if replace_underscores:
-            titles = [title.replace("_", " ") for title in titles]
-        return sep.join(titles)
+            return sep.join(map(attrgetter("display_title"), pages))
+
+        return sep.join(map(attrgetter("title"), pages))
 
     def traverse(
         self,
@@ -839,53 +1546,126 @@ class CategoryGraph:
         list of str or Page
             A list of all traversed pages, in the format specified by return_as. If flatten=False,
             then the results will be a list of lists, where each list.
+
+        Notes
+        -----
+        Each page is returned once, at the first level where it is reached. The starting
+        page is never returned, even if it can be reached from itself through a cycle of
+        categories. Earlier versions returned it as one of its own ancestors (or
+        descendants) in that case.
         """
-        if direction == "parents":
-            get_neighbors = self.get_parents
-        elif direction == "children":
-            get_neighbors = self.get_children
-        else:
+        if direction not in ("parents", "children"):
             raise ValueError(
                 f"direction={direction} is invalid. Must be one of: 'parents', 'children'."
             )
 
-        lvl_page_ids = get_neighbors(
-            page=page, include_hidden=include_hidden, return_as="id"
-        )
-        visited_ids = set()
-        all_page_ids = []
-
-        for _ in range(level):
-            if not flatten:
-                all_page_ids.append([])
-            next_lvl_page_ids = []
-
-            for page_id in lvl_page_ids:
-                if page_id not in visited_ids:
-                    if flatten:
-                        all_page_ids.append(page_id)
-                    else:
-                        all_page_ids[-1].append(page_id)
-
-                    neighbor_ids = get_neighbors(
-                        id=page_id, include_hidden=include_hidden, return_as="id"
-                    )
-                    next_lvl_page_ids.extend(neighbor_ids)
-                    visited_ids.add(page_id)
-            lvl_page_ids = next_lvl_page_ids
+        offsets, neighbors = self._get_csr(direction, include_hidden)
+        start = self._id_to_dense.get(page.id)
+        sources = [] if start is None else [start]
+
+        # the starting page is never returned, even if it is reachable from itself
+        order, boundaries = _bfs_csr(offsets, neighbors, sources, level)
 
         if flatten:
-            return self.__autoconvert_list_of_ids(all_page_ids, return_as)
+            dense_ids = order[boundaries[0] : boundaries[-1]]
+            return self.__autoconvert_dense_ids(dense_ids, return_as)
         else:
             return [
-                self.__autoconvert_list_of_ids(page_ids, return_as)
-                for page_ids in all_page_ids
+                self.__autoconvert_dense_ids(order[begin:end], return_as)
+                for begin, end in zip(boundaries, boundaries[1:])
             ]
 
+    def to_dense_ids(self, ids: "list[str]") -> "list[int]":
+        """
+        Converts page IDs to the dense indices of the pages in the graph. The dense
+        indices are consecutive integers starting at 0, which can be used with
+        `get_dense_neighbors` to walk the graph without building IDs or pages for
+        the pages that are only visited. The index of a page never changes.
+
+        Parameters
+        ----------
+        ids
+            The IDs of the pages.
+
+        Returns
+        -------
+        list of int
+            The dense index of each page.
+
+        Examples
+        --------
+        >>> dense_ids = cg.to_dense_ids(["808487"])  # Montreal
+        >>> cg.from_dense_ids(dense_ids)
+        ['808487']
+        """
+        id_to_dense = self._id_to_dense
+        dense_ids = []
+
+        for id_ in ids:
+            dense_id = id_to_dense.get(str(id_))
+            if dense_id is None:
+                raise ValueError(f"Page with ID={id_} was not found in the graph.")
+            dense_ids.append(dense_id)
+
+        return dense_ids
+
+    def from_dense_ids(self, dense_ids: "list[int]") -> "list[str]":
+        """
+        Converts dense indices (see `to_dense_ids`) back to the IDs of the pages.
+
+        Parameters
+        ----------
+        dense_ids
+            The dense indices of the pages.
+
+        Returns
+        -------
+        list of str
+            The ID of each page.
+        """
+        return self.__autoconvert_dense_ids(dense_ids, "id")
+
+    def get_dense_neighbors(
+        self, dense_id: int, direction: str, include_hidden: bool = False
+    ) -> array:
+        """
+        Get the dense indices (see `to_dense_ids`) of the parents or children of a
+        page, given by its dense index.
+
+        Parameters
+        ----------
+        dense_id
+            The dense index of the page.
+        direction
+            Whether to get the 'parents' or the 'children' of the page.
+        include_hidden
+            Whether to include hidden categories in the results.
+
+        Returns
+        -------
+        array of int
+            The dense indices of the parents or children, in the same order as
+            `get_parents` or `get_children`.
+
+        Examples
+        --------
+        >>> [dense_id] = cg.to_dense_ids(["808487"])  # Montreal
+        >>> children = cg.get_dense_neighbors(dense_id, "children")
+        >>> cg.from_dense_ids(children)
+        ['576883', '1456209', '1970548', '2302534', '3079470', ...]
+        """
+        if direction not in ("parents", "children"):
+            raise ValueError(
+                f"direction={direction} is invalid. Must be one of: 'parents', 'children'."
+            )
+
+        offsets, neighbors = self._get_csr(direction, include_hidden)
+        return neighbors[offsets[dense_id] : offsets[dense_id + 1]]
+
     def get_top_level_categories(self, return_as="page"):
         categories = [
-            self.get_page_from_title(title, namespace="category").id
+            self._id_to_dense[self._get_id_from_title(title, namespace="category")]
             for title in TOP_LEVEL_CATEGORIES
         ]
 
-        return self.__autoconvert_list_of_ids(categories, return_as)
+        return self.__autoconvert_dense_ids(categories, return_as)
@@ -1,7 +1,15 @@
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 import json
 from pathlib import Path
-from urllib.request import urlretrieve
+import time
+from urllib.error import ContentTooShortError, HTTPError
+from urllib.request import Request, urlopen
+
+# Size of the blocks read from the response and written to the file (1 MiB)
+CHUNK_SIZE = 2**20
+# Minimum number of seconds between two progress updates
+PROGRESS_INTERVAL = 0.5
 
 
 def parse_args():
@@ -42,8 +50,77 @@ def parse_args():
 
 # prepare progressbar
 def show_progress(block_num, block_size, total_size):
-    perc = round(block_num * block_size / total_size * 100, 2)
-    print(f"{perc}%", end="\r")
+    _show_progress(block_num * block_size, total_size)
+
+
+def _show_progress(num_bytes, total_size, name=""):
+    prefix = f"{name}: " if name else ""
+
+    if total_size > 0:
+        perc = round(num_bytes / total_size * 100, 2)
+        print(f"{prefix}{perc}%", end="\r")
+    else:
+        print(f"{prefix}{num_bytes / 2**20:.1f} MiB", end="\r")
+
+
+def _get_range_total(headers):
+    # The total size in a Content-Range header ("bytes <start>-<end>/<total>" or
+    # "bytes */<total>"), or None if it is missing or unknown
+    content_range = headers.get("Content-Range", "")
+    total = content_range.rpartition("/")[2]
+    return int(total) if total.isdigit() else None
+
+
+def _stream_to_file(url, path, name=""):
+    """
+    Streams the content of url into path by blocks of CHUNK_SIZE bytes. If path already
+    contains part of the content (e.g. from an interrupted download), only the rest
+    is requested and appended to it. The progress is shown under the given name.
+    Returns the headers of the response. Raises a ContentTooShortError if the size of
+    the content is not the one given by the server, in which case path is kept so that
+    the download can be resumed.
+    """
+    num_bytes = path.stat().st_size if path.is_file() else 0
+    headers = {"Range": f"bytes={num_bytes}-"} if num_bytes > 0 else {}
+
+    try:
+        response = urlopen(Request(url, headers=headers))
+    except HTTPError as e:
+        # The requested range starts at the end of the file, so it is already complete,
+        # unless the size of the file is not the one given by the server
+        if e.code == 416 and num_bytes > 0 and _get_range_total(e.headers) == num_bytes:
+            return e.headers
+        raise
+
+    with response:
+        # The server ignored the range and is sending the whole file again
+        if response.status != 206:
+            num_bytes = 0
+
+        content_length = response.headers.get("Content-Length")
+        total_size = num_bytes + int(content_length) if content_length else 0
+        last_update = 0.0
+
+        with open(path, "ab" if num_bytes > 0 else "wb") as f:
+            for chunk in iter(lambda: response.read(CHUNK_SIZE), b""):
+                f.write(chunk)
+                num_bytes += len(chunk)
+
+                now = time.monotonic()
+                if now - last_update >= PROGRESS_INTERVAL:
+                    _show_progress(num_bytes, total_size, name)
+                    last_update = now
+
+        _show_progress(num_bytes, total_size, name)
+
+        if total_size > 0 and num_bytes != total_size:
+            raise ContentTooShortError(
+                f"{name or url}: got {num_bytes} bytes instead of {total_size}. "
+                "Run it again to resume the download.",
+                None,
+            )
+
+        return response.headers
 
 
 def download_dump(
@@ -113,8 +190,15 @@ def download_dump(
         print("Downloading:", dump_url)
         print("Saving to:", save_path)
 
-        out_path, headers = urlretrieve(dump_url, save_path, show_progress)
-        out_path = Path(out_path)
+        # The file is only moved to save_path once it is complete, so that a partial
+        # download is resumed next time instead of being mistaken for the dump
+        part_path = save_path.with_name(save_path.name + ".part")
+        if ignore_existing and part_path.is_file():
+            # a partial download is not resumed either when the file is redownloaded
+            part_path.unlink()
+        headers = _stream_to_file(dump_url, part_path, name=dump_full_name)
+        part_path.replace(save_path)
+        out_path = save_path
 
         print("Done.")
         print("Saved to:", out_path)
@@ -127,16 +211,26 @@ def download_dump(
 
 
 def main(year, month, day, base_dir, base_url, ignore_existing):
-    for p in ["-page", "-categorylinks"]:
-        download_dump(
-            year=year,
-            month=month,
-            day=day,
-            base_dir=base_dir,
-            base_url=base_url,
-            postfix=p,
-            ignore_existing=ignore_existing,
-        )
+    postfixes = ["-page", "-categorylinks"]
+
+    # The downloads are independent and network-bound, so they are run concurrently
+    with ThreadPoolExecutor(max_workers=len(postfixes)) as executor:
+        futures = [
+            executor.submit(
+                download_dump,
+                year=year,
+                month=month,
+                day=day,
+                base_dir=base_dir,
+                base_url=base_url,
+                postfix=p,
+                ignore_existing=ignore_existing,
+            )
+            for p in postfixes
+        ]
+
+    # raises the error of a failed download, if any
+    return [future.result() for future in futures]
 
 
 if __name__ == "__main__":
@@ -11,13 +11,51 @@ python -m wikicat.processing.generate_graph \
     --base_dir /path/to/save/intermediate/files
 """
 import argparse
+from concurrent.futures import ThreadPoolExecutor
+from importlib.util import find_spec
 import json
 from pathlib import Path
 
-from .. import standardize
 from ..constants import ARTICLE, CATEGORY
 
 
+def standardize_series(titles, form: str = "NFC"):
+    """
+    Standardizes a column of titles the same way as `wikicat.standardize`, using the
+    vectorized string methods of pandas instead of calling it on every row. Each
+    distinct title is only standardized once, since titles are repeated across links.
+    The result is categorical, so that later lookups and filters work on the distinct
+    titles instead of every row.
+
+    Parameters
+    ----------
+    titles : pandas.Series
+        The titles to standardize.
+    form : str, optional
+        The form to normalize the titles to, by default "NFC"
+
+    Returns
+    -------
+    pandas.Series
+        The standardized titles as a categorical Series, with the same index as the
+        input.
+    """
+    import numpy as np
+    import pandas as pd
+
+    codes, uniques = titles.factorize()
+    uniques = uniques.str.replace(" ", "_", regex=False).str.normalize(form)
+
+    # different titles can have the same standardized form (e.g. "A b" and "A_b").
+    # Missing titles have a code of -1, which takes the -1 appended at the end, so
+    # they stay missing instead of getting the last title
+    new_codes, categories = uniques.factorize()
+    new_codes = np.append(new_codes, -1).take(codes)
+    standardized = pd.Categorical.from_codes(new_codes, categories)
+
+    return pd.Series(standardized, index=titles.index, name=titles.name)
+
+
 def generate_graph(df) -> dict:
     """
     Generate the graph JSON file from the raw CSV file.
@@ -63,52 +101,97 @@ def generate_graph(df) -> dict:
     >>> with open("~/.wikicat_data/enwiki_2018_12_20/category_graph.json", "w") as f:
     >>>     json.dump(graph, f)
     """
-    df = df.copy()
+    import numpy as np
+    import pandas as pd
 
-    # Standardize and rename the cl_type
-    df["page_title"] = df["page_title"].apply(standardize)
-    df["cl_to"] = df["cl_to"].apply(standardize)
-    df["cl_type"] = (
-        df["cl_type"].str.replace("subcat", CATEGORY).str.replace("page", ARTICLE)
+    # Standardize and rename the cl_type. Instead of copying the input (which is the
+    # largest object in memory), a new frame is built from the page_id column and the
+    # new columns, so the input is left unchanged and only the new columns are allocated
+    df = pd.DataFrame(
+        {
+            "page_id": df["page_id"],
+            "page_title": standardize_series(df["page_title"]),
+            "cl_to": standardize_series(df["cl_to"]),
+            # only the two distinct values are renamed, instead of every row
+            "cl_type": df["cl_type"]
+            .astype("category")
+            .cat.rename_categories({"subcat": CATEGORY, "page": ARTICLE}),
+        },
+        copy=False,
     )
 
-    # Get id to title mapping, and title to id mapping, and id to type mapping
-    id_to_title = df.set_index("page_id")["page_title"].to_dict()
-    id_to_namespace = df.set_index("page_id")["cl_type"].to_dict()
-    title_to_id = {CATEGORY: {}, ARTICLE: {}}
+    # Get id to title mapping, and title to id mapping, and id to type mapping. A page
+    # has one row per parent category, so the rows are first reduced to one per page
+    # (the first one), and the columns are converted to lists once and zipped
+    pages = df[~df["page_id"].duplicated()]
+    page_ids = pages["page_id"].tolist()
+    id_to_title = dict(zip(page_ids, pages["page_title"].tolist()))
+    id_to_namespace = dict(zip(page_ids, pages["cl_type"].tolist()))
 
-    for id_, title in id_to_title.items():
-        page_type = id_to_namespace[id_]
-        title_to_id[page_type][title] = id_
+    # Each namespace is selected with a mask over the columns, instead of looking up
+    # the namespace of every ID in a Python loop
+    page_id_array = pages["page_id"].to_numpy()
+    title_array = pages["page_title"].to_numpy()
+    title_to_id = {}
 
-    # Remove missing titles
-    cl_to = set(df["cl_to"])
-    cat_titles = set(title_to_id[CATEGORY].keys())
-    missing_cats = cl_to - cat_titles
-    df = df[~df["cl_to"].isin(missing_cats)]
+    for namespace in [CATEGORY, ARTICLE]:
+        mask = (pages["cl_type"] == namespace).to_numpy()
+        title_to_id[namespace] = dict(
+            zip(title_array[mask].tolist(), page_id_array[mask].tolist())
+        )
 
-    # Create new column of the IDs of the linked parent
-    df["cl_id"] = df["cl_to"].apply(lambda title: title_to_id[CATEGORY][title])
+    # Look up the ID of each distinct parent title in a pandas index of the category
+    # titles, through the category codes of cl_to. Parents without a category page get
+    # a position of -1, and their links are removed. Missing parents have a code of -1,
+    # which takes the -1 appended at the end of the positions.
+    category_titles = pd.Index(list(title_to_id[CATEGORY]))
+    category_ids = np.array(list(title_to_id[CATEGORY].values()), dtype="int64")
+    positions = category_titles.get_indexer(df["cl_to"].cat.categories)
+    positions = np.append(positions, -1)[df["cl_to"].cat.codes.to_numpy()]
+    is_found = positions >= 0
 
-    def encode_data(data):
-        return " ".join([str(x) for x in list(data)])
+    # Remove missing titles, and create new column of the IDs of the linked parent
+    df = df[is_found]
+    df["cl_id"] = category_ids[positions[is_found]]
 
-    # Create children to parents mapping and parents to children mapping
-    children_to_parents = df.groupby("page_id")["cl_id"].apply(encode_data).to_dict()
-    parents_to_children = df.groupby("cl_id")["page_id"].apply(encode_data).to_dict()
+    def sort_groups(keys):
+        # Sorts the rows by key once, and finds where the rows of each key start
+        keys = df[keys].to_numpy()
+        order = np.argsort(keys, kind="stable")
+        unique_keys, starts = np.unique(keys[order], return_index=True)
+
+        return order, unique_keys, starts
 
-    # Convert to strings
-    id_to_title = {k: v for k, v in id_to_title.items()}
-    id_to_namespace = {k: v for k, v in id_to_namespace.items()}
+    def group_values(groups, values):
+        # Maps each key to the list of values of its rows, using the groups found by
+        # sort_groups instead of calling pandas for each group. The values are kept as
+        # ints, which are written to the JSON as arrays of numbers.
+        order, unique_keys, starts = groups
+        ends = np.append(starts[1:], len(order)).tolist()
+        values = df[values].to_numpy()[order].tolist()
+
+        return {
+            key: values[start:end]
+            for key, start, end in zip(unique_keys.tolist(), starts.tolist(), ends)
+        }
+
+    # NumPy releases the GIL while sorting, so both sorts run in parallel. Building
+    # the mappings holds the GIL, so it is done afterwards in the main thread.
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        child_groups, parent_groups = executor.map(sort_groups, ["page_id", "cl_id"])
+
+    # Create children to parents mapping and parents to children mapping
+    children_to_parents = group_values(child_groups, "cl_id")
+    parents_to_children = group_values(parent_groups, "page_id")
 
     # Save the JSON file
-    graph_json = dict(
-        id_to_title=id_to_title,
-        id_to_namespace=id_to_namespace,
-        title_to_id=title_to_id,
-        children_to_parents=children_to_parents,
-        parents_to_children=parents_to_children,
-    )
+    graph_json = {
+        "id_to_title": id_to_title,
+        "id_to_namespace": id_to_namespace,
+        "title_to_id": title_to_id,
+        "children_to_parents": children_to_parents,
+        "parents_to_children": parents_to_children,
+    }
 
     return graph_json
 
@@ -124,11 +207,73 @@ def main(year, month, day, base_dir, ignore_existing):
             f"Intermediate directory {int_dir} does not exist. Make run all previous scripts before this one."
         )
 
-    raw_df = pd.read_csv(int_dir / "full_catgraph.csv", na_filter=False)
+    parquet_path = int_dir / "full_catgraph.parquet"
+    csv_path = int_dir / "full_catgraph.csv"
+
+    # merge_tables saves either a Parquet file or a CSV file (see its output_format). If
+    # both exist, the most recent one is used.
+    use_parquet = parquet_path.is_file() and (
+        not csv_path.is_file()
+        or parquet_path.stat().st_mtime >= csv_path.stat().st_mtime
+    )
+
+    if use_parquet:
+        import pyarrow.parquet as pq
+
+        # The columns are converted without being consolidated into blocks, and
+        # each one is freed from the Arrow table once converted, which avoids
+        # holding two or three copies of the largest table in memory
+        raw_df = (
+            pq.read_table(parquet_path)
+            .to_pandas(split_blocks=True, self_destruct=True)
+            .reset_index()
+        )
+        # missing titles are filled like the CSV file is read, where they are ""
+        raw_df = raw_df.fillna({"page_title": "", "cl_to": ""})
+    else:
+        # The C engine is used even if pyarrow is installed: the pyarrow engine ignores
+        # na_filter=False, and would read titles like "NA" or "null" as missing
+        raw_df = pd.read_csv(
+            csv_path,
+            na_filter=False,
+            dtype={
+                "page_id": "int64",
+                "page_title": str,
+                "cl_to": str,
+                "cl_type": "category",
+            },
+            engine="c",
+        )
     graph_json = generate_graph(raw_df)
+    # the table is no longer needed, so it is freed before the output is serialized
+    del raw_df
+
+    save_json(graph_json, int_dir / "category_graph.json")
+
+
+def save_json(graph_json, path):
+    """
+    Saves the graph JSON file. This uses orjson if it is available, which is much faster
+    than the standard json module for a graph of this size.
+
+    Parameters
+    ----------
+    graph_json : dict
+        The graph JSON, as returned by generate_graph.
+    path : str or Path
+        The path where the JSON file will be saved.
+    """
+    if find_spec("orjson") is not None:
+        import orjson
+
+        # The IDs are ints, which the json module converts to strings when used as keys
+        data = orjson.dumps(graph_json, option=orjson.OPT_NON_STR_KEYS)
+        with open(path, "wb") as f:
+            f.write(data)
 
-    with open(int_dir / "category_graph.json", "w") as f:
-        json.dump(graph_json, f)
+    else:
+        with open(path, "w", buffering=2**16) as f:
+            json.dump(graph_json, f, separators=(",", ":"))
 
 
 def parse_args():
@@ -1,8 +1,8 @@
 """
-This file takes the previously-processed separate CSV files for the page and
-category tables and merges them into a single CSV file. This is done to
-reduce the number of files that need to be read in order to generate the
-category graph.
+This file takes the previously-processed separate CSV (or Parquet) files for the
+page and category tables and merges them into a single CSV file (or a Parquet
+file, if pyarrow is installed). This is done to reduce the number of files that need to
+be read in order to generate the category graph.
 
 Usage example:
 
@@ -13,22 +13,208 @@ python -m wikicat.processing.merge_tables \
     --base_dir "~/.wikicat_data/"
 """
 import argparse
+from importlib.util import find_spec
 import json
 from pathlib import Path
 
 import pandas as pd
+from pandas.api.types import union_categoricals
 
+# The namespaces of articles and categories
+KEPT_NAMESPACES = [0, 14]
+# The titles are stored in Arrow arrays instead of Python objects if pyarrow is
+# installed, which takes about half the memory and makes the string operations faster
+STRING_DTYPE = "string[pyarrow]" if find_spec("pyarrow") is not None else str
+# The link types are stored as codes of a categorical, instead of one string per row
+CL_TYPE_DTYPE = pd.CategoricalDtype(["page", "subcat", "file"])
+# Size of the blocks of the CSV files that pyarrow parses in parallel. Larger blocks
+# have less overhead per block, but the default (1 MiB) is tuned for small files
+CSV_BLOCK_SIZE = 64 << 20
 
-def merge_tables(page_csv_filepath, category_csv_filepath):
+
+def read_page_table(page_csv_filepath, chunksize=10_000_000):
+    """
+    Read the ID, title and namespace of the articles and categories in the page table.
+    The rows of other namespaces are dropped while the file is read, so the full
+    table is never loaded.
+
+    Parameters
+    ----------
+    page_csv_filepath : str
+        Path to the page CSV file, or to a Parquet file if it ends with ".parquet".
+    chunksize : int, optional
+        Number of rows to read at a time if pyarrow is not installed, by default
+        10_000_000.
+
+    Returns
+    -------
+    pandas.DataFrame
+        The page table, indexed by page_id.
+
+    Notes
+    -----
+    If pyarrow is installed, the file is read as a pyarrow dataset, which only
+    parses the needed columns and applies the namespace filter while scanning. The
+    Arrow table is converted to pandas column by column, and each column is freed
+    once converted, so the table and the frame are not both held in memory.
+    Titles such as "NA" or "null" are read as strings, not as missing values.
+    """
+    columns = ["page_id", "page_title", "page_namespace"]
+
+    if str(page_csv_filepath).endswith(".parquet"):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        page_df = pq.read_table(
+            page_csv_filepath,
+            columns=columns,
+            filters=[("page_namespace", "in", KEPT_NAMESPACES)],
+        ).to_pandas(
+            types_mapper={pa.string(): pd.StringDtype("pyarrow")}.get,
+            split_blocks=True,
+            self_destruct=True,
+        )
+
+    elif find_spec("pyarrow") is not None:
+        import pyarrow as pa
+        import pyarrow.csv
+        import pyarrow.dataset as ds
+
+        convert_options = pyarrow.csv.ConvertOptions(
+            column_types={
+                "page_id": pa.int32(),
+                "page_title": pa.string(),
+                "page_namespace": pa.int32(),
+            },
+        )
+        dataset = ds.dataset(
+            page_csv_filepath,
+            format=ds.CsvFileFormat(
+                convert_options=convert_options,
+                read_options=pyarrow.csv.ReadOptions(block_size=CSV_BLOCK_SIZE),
+            ),
+        )
+        page_df = dataset.to_table(
+            columns=columns,
+            filter=ds.field("page_namespace").isin(KEPT_NAMESPACES),
+        ).to_pandas(
+            types_mapper={pa.string(): pd.StringDtype("pyarrow")}.get,
+            split_blocks=True,
+            self_destruct=True,
+        )
+
+    else:
+        page_chunks = pd.read_csv(
+            page_csv_filepath,
+            usecols=columns,
+            dtype={
+                "page_id": "int32",
+                "page_title": STRING_DTYPE,
+                "page_namespace": "int32",
+            },
+            na_filter=False,
+            chunksize=chunksize,
+        )
+        page_df = pd.concat(
+            chunk[chunk["page_namespace"].isin(KEPT_NAMESPACES)]
+            for chunk in page_chunks
+        )
+
+    # only namespaces 0 and 14 are left, so they fit in a single byte
+    page_df["page_namespace"] = page_df["page_namespace"].astype("int8")
+    # A page has one row per parent category in the merged table, so the titles are
+    # made categorical once here, and the merge only repeats their integer codes
+    page_df["page_title"] = page_df["page_title"].astype("category")
+
+    return page_df.set_index("page_id")
+
+
+def read_category_table(category_csv_filepath, chunksize=10_000_000):
+    """
+    Read the child ID, parent title and type of the links in the category table,
+    chunk by chunk.
+
+    Parameters
+    ----------
+    category_csv_filepath : str
+        Path to the category CSV file, or to a Parquet file if it ends with ".parquet".
+    chunksize : int, optional
+        Maximum number of rows in each chunk, by default 10_000_000.
+
+    Yields
+    ------
+    pandas.DataFrame
+        A chunk of the category table, indexed by cl_from.
+
+    Notes
+    -----
+    If pyarrow is installed, the file is read as a pyarrow dataset, which parses
+    the blocks of the file in parallel and only the needed columns. The chunks are
+    then limited by the block size as well as by chunksize.
+    """
+    columns = ["cl_from", "cl_to", "cl_type"]
+
+    if str(category_csv_filepath).endswith(".parquet"):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        batches = pq.ParquetFile(category_csv_filepath).iter_batches(
+            batch_size=chunksize, columns=columns
+        )
+
+    elif find_spec("pyarrow") is not None:
+        import pyarrow as pa
+        import pyarrow.csv
+        import pyarrow.dataset as ds
+
+        convert_options = pyarrow.csv.ConvertOptions(
+            column_types={
+                "cl_from": pa.int32(),
+                "cl_to": pa.string(),
+                "cl_type": pa.string(),
+            },
+        )
+        dataset = ds.dataset(
+            category_csv_filepath,
+            format=ds.CsvFileFormat(
+                convert_options=convert_options,
+                read_options=pyarrow.csv.ReadOptions(block_size=CSV_BLOCK_SIZE),
+            ),
+        )
+        batches = dataset.to_batches(columns=columns, batch_size=chunksize)
+
+    else:
+        # The pyarrow engine of pandas does not support chunksize
+        yield from pd.read_csv(
+            category_csv_filepath,
+            usecols=columns,
+            dtype={"cl_from": "int32", "cl_to": STRING_DTYPE, "cl_type": CL_TYPE_DTYPE},
+            na_filter=False,
+            index_col="cl_from",
+            chunksize=chunksize,
+        )
+        return
+
+    types_mapper = {pa.string(): pd.StringDtype("pyarrow")}.get
+    for batch in batches:
+        category_df = batch.to_pandas(types_mapper=types_mapper)
+        category_df["cl_type"] = category_df["cl_type"].astype(CL_TYPE_DTYPE)
+        yield category_df.set_index("cl_from")
+
+
+def merge_tables(page_csv_filepath, category_csv_filepath, chunksize=10_000_000):
     """
     Merge the page and category tables into a single table.
 
     Parameters
     ----------
     page_csv_filepath : str
-        Path to the page CSV file.
+        Path to the page CSV (or Parquet) file.
     category_csv_filepath : str
-        Path to the category CSV file.
+        Path to the category CSV (or Parquet) file.
+    chunksize : int, optional
+        Number of rows of the category file to read and merge at a time, by default
+        10_000_000. A larger chunk size will use more memory, but will be faster.
 
     Returns
     -------
@@ -48,34 +234,71 @@ def merge_tables(page_csv_filepath, category_csv_filepath):
     >>> print(df.head(10))
     >>> df.to_csv("~/.wikicat_data/enwiki_2018_12_20/full_catgraph.csv")
     """
-    page_df = pd.read_csv(
-        page_csv_filepath,
-        usecols=["page_id", "page_title", "page_namespace"],
-        dtype={"page_id": "int32", "page_title": str, "page_namespace": "int32"},
-    ).set_index("page_id")
-
-    category_df = pd.read_csv(category_csv_filepath).set_index("cl_from")
+    # only articles and categories are kept, before the merge rather than after it,
+    # so that links from other pages are dropped as soon as their chunk is merged
+    page_df = read_page_table(page_csv_filepath, chunksize=chunksize)
 
-    full_df = pd.merge(
-        page_df, category_df, left_index=True, right_index=True, how="right", copy=False
-    )
+    # The page table of the dumps is ordered by page_id, and the category table by
+    # cl_from. When both indices are sorted, pandas merges them in a single pass
+    # instead of hashing page_df for every chunk, so page_df is sorted if it is not
+    if not page_df.index.is_monotonic_increasing:
+        page_df = page_df.sort_index()
 
-    # keep only certain columns
-    full_df = full_df[["page_namespace", "page_title", "cl_to", "cl_type"]]
+    # The category table is the largest one, so it is merged chunk by chunk instead
+    # of being loaded in full
+    category_chunks = read_category_table(category_csv_filepath, chunksize=chunksize)
 
-    # keep only articles and categories
-    full_df = full_df[
-        (full_df["page_namespace"] == 0) | (full_df["page_namespace"] == 14)
+    merged_chunks = [
+        # The order of the links is kept, as with the right merge on the full table.
+        # The parent titles are repeated across links, so they are factorized before
+        # the join, which then only carries their codes. Both frames are indexed by
+        # page ID, so DataFrame.join is used, which skips the column handling of merge
+        category_df.astype({"cl_to": "category"}).join(page_df, how="inner")[
+            ["page_namespace", "page_title", "cl_to", "cl_type"]
+        ]
+        for category_df in category_chunks
     ]
 
-    full_df.index.name = "page_id"
+    # An empty category table may not yield any chunk (e.g. with pyarrow), and
+    # neither union_categoricals nor concat accept an empty list
+    if not merged_chunks:
+        return pd.DataFrame(
+            {
+                "page_namespace": pd.Series(dtype="int8"),
+                "page_title": pd.Series(dtype="category"),
+                "cl_to": pd.Series(dtype="category"),
+                "cl_type": pd.Series(dtype=CL_TYPE_DTYPE),
+            },
+            index=pd.Index([], dtype="int64", name="page_id"),
+        )
+
+    # The chunks have different cl_to categories, which concat would turn back into
+    # strings, so their categories are combined separately
+    cl_to = union_categoricals([chunk["cl_to"] for chunk in merged_chunks])
+    full_df = pd.concat([chunk.drop(columns="cl_to") for chunk in merged_chunks])
+    full_df.insert(2, "cl_to", cl_to)
 
-    full_df.sort_index(inplace=True)
+    full_df.index.name = "page_id"
 
+    # The rows are not sorted by page_id, since generate_graph sorts the links itself
+    # when grouping them. The category table of the dumps is ordered by cl_from anyway.
     return full_df
 
 
-def main(year, month, day, base_dir, ignore_existing):
+def _get_latest_table_path(int_dir, name):
+    parquet_path = int_dir / f"{name}.parquet"
+    csv_path = int_dir / f"{name}.csv"
+
+    if parquet_path.is_file() and (
+        not csv_path.is_file()
+        or parquet_path.stat().st_mtime >= csv_path.stat().st_mtime
+    ):
+        return parquet_path
+
+    return csv_path
+
+
+def main(year, month, day, base_dir, ignore_existing, output_format="auto"):
     base_dir = Path(base_dir).expanduser()
     base_dir.mkdir(parents=True, exist_ok=True)
 
@@ -86,16 +309,28 @@ def main(year, month, day, base_dir, ignore_existing):
             f"Intermediate directory {int_dir} does not exist. Make sure to run the download_dump.py script first."
         )
 
-    # default names for filepath arguments
-    page_csv_load_path = int_dir / "page.csv"
-    category_csv_load_path = int_dir / "categorylinks.csv"
-    save_filepath = int_dir / "full_catgraph.csv"
+    # default names for filepath arguments. process_dump saves the tables as either
+    # Parquet or CSV files (see its output_format); the most recent ones are used.
+    page_csv_load_path = _get_latest_table_path(int_dir, "page")
+    category_csv_load_path = _get_latest_table_path(int_dir, "categorylinks")
 
     # merge the tables
     full_df = merge_tables(page_csv_load_path, category_csv_load_path)
 
-    # Save the full dataframe to a CSV file
-    full_df.to_csv(save_filepath)
+    # Save the full dataframe to a Parquet file by default if pyarrow is installed,
+    # since the repeated titles are dictionary-encoded and are read back without being
+    # parsed. Otherwise, save it to a CSV file. generate_graph reads either one.
+    if output_format == "auto":
+        output_format = "parquet" if find_spec("pyarrow") is not None else "csv"
+
+    if output_format == "parquet":
+        full_df.to_parquet(int_dir / "full_catgraph.parquet", compression="zstd")
+    elif output_format == "csv":
+        full_df.to_csv(int_dir / "full_catgraph.csv")
+    else:
+        raise ValueError(
+            f"output_format={output_format} is invalid. It should be one of: 'auto', 'parquet', 'csv'."
+        )
 
 
 def parse_args():
@@ -124,6 +359,12 @@ def parse_args():
         action="store_true",
         help="Ignore cached output file. Only do this if you previous generated the file and want to regenerate it.",
     )
+    parser.add_argument(
+        "--output_format",
+        choices=["auto", "parquet", "csv"],
+        default="auto",
+        help="Format of the merged file. 'auto' uses Parquet if pyarrow is installed, and CSV otherwise.",
+    )
 
     return parser.parse_args()
 
@@ -1,6 +1,7 @@
 """
 This file takes the wikipedia dump in sql.gz format for a given date and
-process it into a csv file in a record format to be used in further processing.
+process it into a csv file (or a Parquet file, if pyarrow is installed) in a
+record format to be used in further processing.
 
 Usage example:
 
@@ -12,27 +13,173 @@ python -m wikicat.processing.process_dump \
     --use_2018_schema auto
 """
 import argparse
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache
+import gzip
+from importlib.util import find_spec
 import json
+import os
 from pathlib import Path
+import shutil
+import subprocess
 
 import kwnlp_sql_parser
 
 # TODO
 # Update requirements.txt to include pandas and kwnlp_sql_parser with current version
 
+DECOMPRESSORS = ["auto", "pigz", "igzip", "gzip"]
+# Size of the reads from the dump file, instead of the default 8 KiB
+READ_BUFFER_SIZE = 2**20
+# The columns that are written as integers in the Parquet files; the others are strings
+INT_COLUMNS = ["page_id", "page_namespace", "cl_from"]
+
+
+def _resolve_decompressor(decompressor):
+    if decompressor not in DECOMPRESSORS:
+        raise ValueError(
+            f"Invalid value for decompressor: {decompressor}. "
+            f"Must be one of {DECOMPRESSORS}."
+        )
+
+    if decompressor == "auto":
+        if shutil.which("pigz") is not None:
+            return "pigz"
+        if find_spec("isal") is not None:
+            return "igzip"
+        return "gzip"
+
+    return decompressor
+
+
+@lru_cache(maxsize=None)
+def _get_2018_page_columns():
+    # the 2018 schema of the page table has a page_counter column after
+    # page_restrictions, which was removed in later dumps
+    page_col_l = list(kwnlp_sql_parser.wp_sql_patterns._TABLE_COLUMN_PATTERNS["page"])
+    page_c = kwnlp_sql_parser.WikipediaSqlColumn(
+        "page_counter", kwnlp_sql_parser.wp_sql_patterns.DIGITS
+    )
+    page_col_l.insert(4, page_c)
+    return tuple(page_col_l)
+
+
+@contextmanager
+def _patched_page_schema(use_2018_schema):
+    """
+    Replace the columns of the page table in kwnlp_sql_parser with the 2018 schema
+    while in the context, and restore the original columns afterwards, even if an
+    error is raised. The patched columns are only built once per process.
+    """
+    if not use_2018_schema:
+        yield
+        return
+
+    patterns = kwnlp_sql_parser.wp_sql_patterns._TABLE_COLUMN_PATTERNS
+    original_col_list = patterns["page"]
+    patterns["page"] = _get_2018_page_columns()
+    try:
+        yield
+    finally:
+        patterns["page"] = original_col_list
+
+
+class _WikipediaSqlDump(kwnlp_sql_parser.WikipediaSqlDump):
+    """
+    WikipediaSqlDump that can decompress the dump with pigz (in a separate process,
+    using several threads) or with isal's igzip, which are both much faster than the
+    gzip module that the parser would otherwise wait on.
+    """
+
+    decompressor = "gzip"
+
+    @contextmanager
+    def _open_dump_file(self):
+        if not self.compressed or self.decompressor == "gzip":
+            # The dump is read in large blocks, and the kernel is told that it is read
+            # sequentially so it reads ahead of the parser
+            with open(self.filename, "rb", buffering=READ_BUFFER_SIZE) as raw:
+                if hasattr(os, "posix_fadvise"):
+                    os.posix_fadvise(raw.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+
+                if not self.compressed:
+                    yield raw
+                else:
+                    with gzip.GzipFile(fileobj=raw, mode="rb") as fp:
+                        yield fp
+
+        elif self.decompressor == "pigz":
+            proc = subprocess.Popen(
+                ["pigz", "-dc", self.filename], stdout=subprocess.PIPE, bufsize=1 << 20
+            )
+            try:
+                yield proc.stdout
+            finally:
+                proc.stdout.close()
+                returncode = proc.wait()
+            if returncode != 0:
+                raise subprocess.CalledProcessError(returncode, proc.args)
+
+        else:
+            from isal import igzip
+
+            with igzip.open(self.filename, "rb") as fp:
+                yield fp
+
+    def to_parquet(self, outfile, batch_size=500_000):
+        """
+        Write the rows of the dump to a Parquet file, like to_csv, with one row group
+        per batch of rows. The integer columns are stored as int32.
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        names = self.get_csv_header()
+        schema = pa.schema(
+            [(n, pa.int32() if n in INT_COLUMNS else pa.string()) for n in names]
+        )
+
+        def write_batch(writer, matches):
+            rows = self.sqlrow.csv_rows_from_matches(matches)
+            if not rows:
+                return
+            arrays = [
+                pa.array(column, type=pa.string()).cast(field.type)
+                for column, field in zip(zip(*rows), schema)
+            ]
+            writer.write_batch(pa.record_batch(arrays, schema=schema))
+
+        with pq.ParquetWriter(outfile, schema, compression="zstd") as writer:
+            batch_matches = []
+            for _, _, match in self.iter_matched_rows():
+                batch_matches.append(match)
+                if len(batch_matches) >= batch_size:
+                    write_batch(writer, batch_matches)
+                    batch_matches = []
+
+            write_batch(writer, batch_matches)
+
 
 def process_dump(
-    dumpfile, output_filename, batch_size=50_000_000, use_2018_schema=False
+    dumpfile,
+    output_filename,
+    batch_size=50_000_000,
+    use_2018_schema=False,
+    keep_column_names=None,
+    allowlists=None,
+    decompressor="auto",
 ):
     """
-    Process a wikipedia dump into a csv file.
+    Process a wikipedia dump into a csv file, or a Parquet file if output_filename
+    ends with ".parquet".
 
     Parameters
     ----------
     dumpfile : str
         Path to the wikipedia dump file.
     output_filename : str
-        Path to the output csv file.
+        Path to the output csv or Parquet file.
     batch_size : int, optional
         Number of rows to process at a time, by default 50_000_000. This
         parameter is passed to kwnlp_sql_parser.WikipediaSqlDump.to_csv.
@@ -40,6 +187,16 @@ def process_dump(
         the batch size if you run out of memory while processing the dump.
     use_2018_schema : bool, optional
         Whether to use the 2018 schema for the page table, by default False.
+    keep_column_names : tuple of str, optional
+        Names of the columns to write to the csv file, by default None, which
+        writes all of them.
+    allowlists : dict, optional
+        Maps column names to the tuple of values that are kept, by default None,
+        which keeps all rows. The other rows are dropped before they are written.
+    decompressor : str, optional
+        Tool used to decompress the dump, one of "pigz", "igzip" (from the isal
+        package) or "gzip" (the standard library), by default "auto", which uses the
+        first one that is available.
 
     Notes
     -----
@@ -75,39 +232,35 @@ def process_dump(
             "Must be one of True, False, 'true', 'false', or 'auto'."
         )
 
-    print(f"Converting {dumpfile} into csv...")
+    output_format = "parquet" if output_filename.endswith(".parquet") else "csv"
+    print(f"Converting {dumpfile} into {output_format}...")
 
     if use_2018_schema:
         print("Using 2018 schema")
-        # copy original tuple
-        original_col_list = tuple(
-            list(kwnlp_sql_parser.wp_sql_patterns._TABLE_COLUMN_PATTERNS["page"])
-        )
-        page_col_l = list(
-            kwnlp_sql_parser.wp_sql_patterns._TABLE_COLUMN_PATTERNS["page"]
-        )
-        # page_r = kwnlp_sql_parser.WikipediaSqlColumn("page_restrictions", kwnlp_sql_parser.wp_sql_patterns.SINGLE_QUOTED_ANYTHING)
-        page_c = kwnlp_sql_parser.WikipediaSqlColumn(
-            "page_counter", kwnlp_sql_parser.wp_sql_patterns.DIGITS
-        )
-        # page_col_l.insert(3, page_r)
-        page_col_l.insert(4, page_c)
-        kwnlp_sql_parser.wp_sql_patterns._TABLE_COLUMN_PATTERNS["page"] = tuple(
-            page_col_l
-        )
-
-    wsd = kwnlp_sql_parser.WikipediaSqlDump(dumpfile)
 
-    wsd.to_csv(batch_size=batch_size, outfile=output_filename)
+    with _patched_page_schema(use_2018_schema):
+        wsd = _WikipediaSqlDump(
+            dumpfile, keep_column_names=keep_column_names, allowlists=allowlists
+        )
+        wsd.decompressor = _resolve_decompressor(decompressor)
 
-    # reverse changes to library's col list
-    if use_2018_schema:
-        kwnlp_sql_parser.wp_sql_patterns._TABLE_COLUMN_PATTERNS[
-            "page"
-        ] = original_col_list
+        if output_format == "parquet":
+            wsd.to_parquet(batch_size=batch_size, outfile=output_filename)
+        else:
+            wsd.to_csv(batch_size=batch_size, outfile=output_filename)
 
 
-def main(year, month, day, base_dir, use_2018_schema, batch_size, ignore_existing):
+def main(
+    year,
+    month,
+    day,
+    base_dir,
+    use_2018_schema,
+    batch_size,
+    ignore_existing,
+    decompressor="auto",
+    output_format="auto",
+):
     base_dir = Path(base_dir).expanduser()
     int_dir = base_dir / f"enwiki_{year}_{month:02d}_{day:02d}"
     int_dir.mkdir(parents=True, exist_ok=True)
@@ -116,33 +269,70 @@ def main(year, month, day, base_dir, use_2018_schema, batch_size, ignore_existin
     prefix = f"enwiki-{year}{month:02d}{day:02d}-"
 
     page_table_load_path = int_dir / f"{prefix}page.sql.gz"
-    page_csv_save_path = int_dir / "page.csv"
+    # The tables are saved as Parquet files by default if pyarrow is installed, so that
+    # merge_tables reads them without parsing them again
+    if output_format == "auto":
+        output_format = "parquet" if find_spec("pyarrow") is not None else "csv"
+    if output_format not in ["parquet", "csv"]:
+        raise ValueError(
+            f"output_format={output_format} is invalid. It should be one of: 'auto', 'parquet', 'csv'."
+        )
+
+    page_csv_save_path = int_dir / f"page.{output_format}"
 
     category_table_load_path = int_dir / f"{prefix}categorylinks.sql.gz"
-    cat_csv_save_path = int_dir / "categorylinks.csv"
+    cat_csv_save_path = int_dir / f"categorylinks.{output_format}"
 
     # fix issue with argparse booleans
     if use_2018_schema == "auto":
         use_2018_schema = "2018" == str(year)
 
-    if page_csv_save_path.is_file() and not ignore_existing:
-        print(f"Skipping {page_csv_save_path}, already exists...")
-    else:
-        process_dump(
+    # Only the columns and namespaces used by merge_tables are written, which makes
+    # the csv files several times smaller and skips formatting the other columns
+    jobs = []
+    for load_path, save_path, keep_column_names, allowlists in [
+        (
             page_table_load_path,
-            output_filename=page_csv_save_path,
-            use_2018_schema=use_2018_schema,
-            batch_size=batch_size,
-        )
-    if cat_csv_save_path.is_file() and not ignore_existing:
-        print(f"Skipping {cat_csv_save_path}, already exists...")
-    else:
-        process_dump(
+            page_csv_save_path,
+            ("page_id", "page_namespace", "page_title"),
+            {"page_namespace": ("0", "14")},
+        ),
+        (
             category_table_load_path,
-            output_filename=cat_csv_save_path,
-            use_2018_schema=use_2018_schema,
-            batch_size=batch_size,
-        )
+            cat_csv_save_path,
+            ("cl_from", "cl_to", "cl_type"),
+            None,
+        ),
+    ]:
+        if save_path.is_file() and not ignore_existing:
+            print(f"Skipping {save_path}, already exists...")
+        else:
+            jobs.append((load_path, save_path, keep_column_names, allowlists))
+
+    if not jobs:
+        return
+
+    # The dumps are independent and parsing them is CPU-bound, so they are processed
+    # in separate processes. The 2018 schema patches kwnlp_sql_parser's column
+    # patterns, which is done within each process by process_dump.
+    with ProcessPoolExecutor(max_workers=len(jobs)) as executor:
+        futures = [
+            executor.submit(
+                process_dump,
+                load_path,
+                output_filename=save_path,
+                use_2018_schema=use_2018_schema,
+                batch_size=batch_size,
+                keep_column_names=keep_column_names,
+                allowlists=allowlists,
+                decompressor=decompressor,
+            )
+            for load_path, save_path, keep_column_names, allowlists in jobs
+        ]
+
+    # raises the error of a failed conversion, if any
+    for future in futures:
+        future.result()
 
 
 def parse_args():
@@ -182,6 +372,19 @@ def parse_args():
         action="store_true",
         help="Ignore cached output file. Only do this if you previous generated the file and want to regenerate it.",
     )
+    parser.add_argument(
+        "--decompressor",
+        type=str,
+        help="Tool used to decompress the dumps. 'auto' uses pigz if it is installed, then isal's igzip, then Python's gzip module.",
+        default="auto",
+        choices=DECOMPRESSORS,
+    )
+    parser.add_argument(
+        "--output_format",
+        choices=["auto", "parquet", "csv"],
+        default="auto",
+        help="Format of the processed tables. 'auto' uses Parquet if pyarrow is installed, and CSV otherwise.",
+    )
 
     return parser.parse_args()
 
@@ -1,3 +1,5 @@
+from functools import lru_cache
+from importlib.util import find_spec
 from pathlib import Path
 from textwrap import dedent
 
@@ -10,6 +12,15 @@ from ..constants import ARTICLE
 from . import utils
 from . import components as comp
 
+# Number of article names typed in the input whose validation is memoized
+VALIDATION_CACHE_SIZE = 4096
+# Number of node selections whose graph elements are memoized
+ELEMENTS_CACHE_SIZE = 32
+# Number of clicked nodes whose markdown is memoized
+CLICKED_NODE_CACHE_SIZE = 512
+# Number of tapped nodes whose checklist options are memoized
+NEIGHBOR_OPTIONS_CACHE_SIZE = 512
+
 
 def assign_callbacks(
     app: dash.Dash, cg: CategoryGraph, cyto_graph, inp, btn, cl, sw, md, sto, dd, root
@@ -22,6 +33,9 @@ def assign_callbacks(
     and the `root` argument to access the root node id.
     """
 
+    # The article titles do not change while the app runs, so the dict is looked up once
+    article_titles = cg.title_to_id[ARTICLE]
+
     # Define callbacks
     @app.callback(
         Output(inp.choose_article, "valid"),
@@ -33,30 +47,38 @@ def assign_callbacks(
         if text is None or text == "":
             return False, True, True
 
-        text = standardize(text)
-
-        if text in cg.title_to_id[ARTICLE]:
+        if is_article_title(text):
             return True, False, False
         else:
             return False, True, True
 
+    # The input is validated on every keystroke, and the same texts come back when the
+    # user deletes characters, so the normalization and lookup are memoized per text
+    @lru_cache(maxsize=VALIDATION_CACHE_SIZE)
+    def is_article_title(text):
+        return standardize(text) in article_titles
+
     @app.callback(Output(md.clicked_node, "children"), Input(cyto_graph, "tapNodeData"))
     def update_clicked_node(node_data):
         if node_data is None:
             return "No node selected"
 
-        page = cg.get_page_from_id(node_data["id"])
+        return render_clicked_node(node_data["id"])
 
-        articles = [c for c in cg.get_children(page) if c.is_article()]
+    # Tapping a node again (or going back to it) reuses its markdown instead of
+    # scanning its children and formatting every article again
+    @lru_cache(maxsize=CLICKED_NODE_CACHE_SIZE)
+    def render_clicked_node(node_id):
+        page = cg.get_page_from_id(node_id)
 
-        article_list = [
-            f"- [{a.title.replace('_', ' ')}]({a.get_url()})" for a in articles
-        ]
+        articles = cg.get_children(page, child_namespace="article")
+
+        article_list = [f"- [{a.display_title}]({a.get_url()})" for a in articles]
         article_list_str = "\n".join(article_list)
 
         pre = dedent(
             f"""
-            ## [{page.title.replace('_', ' ')}]({page.get_url()})
+            ## [{page.display_title}]({page.get_url()})
             
             ID: {page.id}
 
@@ -86,43 +108,61 @@ def assign_callbacks(
         if clicked_data is None:
             raise dash.exceptions.PreventUpdate
 
-        if utils.was_triggered(btn.reset_graph, "n_clicks"):
-            return [], [], [], []
+        # tapping a node (or the first call) lists its neighbors
+        handler = checklist_handlers.get(utils.triggered_id(), list_neighbors)
 
-        if utils.was_triggered(sw.children, "value"):
-            if child_checked:
-                res = cg.get_children(id=clicked_data["id"], return_as="id")
-            else:
-                res = []
+        return handler(child_checked, parent_checked, clicked_data["id"], stored_data)
 
-            return dash.no_update, res, dash.no_update, dash.no_update
+    def reset_checklist(child_checked, parent_checked, node_id, stored_data):
+        return [], [], [], []
 
-        if utils.was_triggered(sw.parents, "value"):
-            if parent_checked:
-                res = cg.get_parents(id=clicked_data["id"], return_as="id")
-            else:
-                res = []
+    def toggle_children(child_checked, parent_checked, node_id, stored_data):
+        if child_checked:
+            res = cg.get_children(id=node_id, return_as="id")
+        else:
+            res = []
 
-            return dash.no_update, dash.no_update, dash.no_update, res
+        return dash.no_update, res, dash.no_update, dash.no_update
 
-        stored_data = set(stored_data)
-        children = [
-            c for c in cg.get_children(id=clicked_data["id"]) if c.is_category()
-        ]
-        parents = [p for p in cg.get_parents(id=clicked_data["id"]) if p.is_category()]
+    def toggle_parents(child_checked, parent_checked, node_id, stored_data):
+        if parent_checked:
+            res = cg.get_parents(id=node_id, return_as="id")
+        else:
+            res = []
 
-        options_children = [
-            {"label": c.title.replace("_", " "), "value": c.id} for c in children
-        ]
-        value_children = [c.id for c in children if c.id in stored_data]
+        return dash.no_update, dash.no_update, dash.no_update, res
 
-        options_parents = [
-            {"label": p.title.replace("_", " "), "value": p.id} for p in parents
-        ]
-        value_parents = [p.id for p in parents if p.id in stored_data]
+    def list_neighbors(child_checked, parent_checked, node_id, stored_data):
+        options_children, children, options_parents, parents = neighbor_options(node_id)
+
+        is_stored = set(stored_data).__contains__
+        value_children = list(filter(is_stored, children))
+        value_parents = list(filter(is_stored, parents))
 
         return options_children, value_children, options_parents, value_parents
 
+    # Tapping a node again (or going back to it) reuses its checklist options, since
+    # only the checked values depend on the stored nodes
+    @lru_cache(maxsize=NEIGHBOR_OPTIONS_CACHE_SIZE)
+    def neighbor_options(node_id):
+        children = cg.get_children(id=node_id, child_namespace="category")
+        parents = [p for p in cg.get_parents(id=node_id) if p.is_category()]
+
+        return (
+            [{"label": c.display_title, "value": c.id} for c in children],
+            [c.id for c in children],
+            [{"label": p.display_title, "value": p.id} for p in parents],
+            [p.id for p in parents],
+        )
+
+    # The component that triggered the callback is looked up once in these dicts,
+    # instead of comparing its prop ID against every input in turn
+    checklist_handlers = {
+        btn.reset_graph.id: reset_checklist,
+        sw.children.id: toggle_children,
+        sw.parents.id: toggle_parents,
+    }
+
     @app.callback(
         Output(sto.selected_nodes, "data"),
         Input(btn.update_graph, "n_clicks"),
@@ -137,9 +177,26 @@ def assign_callbacks(
         State(sto.selected_nodes, "data"),
     )
     def update_selected_nodes(
-        n_clicks_update,
-        n_clicks_reset,
-        n_clicks_show_path,
+        n_clicks_update, n_clicks_reset, n_clicks_show_path, *state
+    ):
+        handler = selection_handlers.get(utils.triggered_id())
+        if handler is None:
+            return dash.no_update
+
+        selection = handler(*state)
+
+        # An unchanged selection is not stored again, so update_graph is not called
+        # to rebuild the same elements. This is compared with the store of the
+        # session rather than a variable on the server, which is shared by all users.
+        stored_data = state[-1]
+        if selection is not dash.no_update and stored_data is not None:
+            if set(selection) == set(stored_data):
+                return dash.no_update
+
+        return selection
+
+    # Each handler receives the states of update_selected_nodes, in the same order
+    def reset_selection(
         selected_children,
         options_children,
         selected_parents,
@@ -148,25 +205,37 @@ def assign_callbacks(
         chosen_tlc_id,
         stored_data,
     ):
-        if utils.was_triggered(btn.reset_graph, "n_clicks"):
-            return [root.id]
-
-        if utils.was_triggered(btn.show_path, "n_clicks"):
-            if chosen_article_name is None:
-                return dash.no_update
+        return [root.id]
 
-            article = cg.get_page_from_title(chosen_article_name, namespace="article")
-            target = cg.get_page_from_id(chosen_tlc_id)
+    def show_path(
+        selected_children,
+        options_children,
+        selected_parents,
+        options_parents,
+        chosen_article_name,
+        chosen_tlc_id,
+        stored_data,
+    ):
+        if chosen_article_name is None:
+            return dash.no_update
 
-            backlinks = utils.bfs_with_backlinks(cg, article, target)
-            chain = utils.extract_chain(backlinks, article, target)
+        article = cg.get_page_from_title(chosen_article_name, namespace="article")
+        target = cg.get_page_from_id(chosen_tlc_id)
 
-            return [root.id] + chain
+        backlinks = utils.bfs_with_backlinks(cg, article, target)
+        chain = utils.extract_chain(backlinks, article, target)
 
-        if n_clicks_update is None:
-            return dash.no_update
+        return [root.id] + chain
 
-        # If btn_update_graph was triggered, continue here
+    def update_selection(
+        selected_children,
+        options_children,
+        selected_parents,
+        options_parents,
+        chosen_article_name,
+        chosen_tlc_id,
+        stored_data,
+    ):
         if selected_children is None and selected_parents is None:
             return dash.no_update
 
@@ -182,16 +251,20 @@ def assign_callbacks(
         selected = set(selected_children + selected_parents)
         options = options_children + options_parents
 
-        stored_data = set(stored_data)
-        not_selected = [o["value"] for o in options if o["value"] not in selected]
-
-        for id in selected:
-            stored_data.add(id)
+        # the options that are not selected are removed from the stored nodes, and the
+        # selected ones are added, with set operations instead of per-node loops
+        option_ids = {o["value"] for o in options}
+        stored_data = (set(stored_data) - option_ids) | selected
 
-        for i in not_selected:
-            stored_data.discard(i)
+        # the selection is stored in a canonical order, so the same selection always
+        # gives the same store data (and the same key for the elements cache)
+        return sorted(stored_data)
 
-        return list(stored_data)
+    selection_handlers = {
+        btn.reset_graph.id: reset_selection,
+        btn.show_path.id: show_path,
+        btn.update_graph.id: update_selection,
+    }
 
     @app.callback(
         Output(cyto_graph, "elements"),
@@ -201,39 +274,62 @@ def assign_callbacks(
         if selected_nodes is None:
             return dash.no_update
 
-        selected_nodes = set(selected_nodes)
+        return build_elements(frozenset(selected_nodes))
 
+    # The same selections come back as nodes are toggled on and off, so the elements
+    # are memoized per selection. Dash serializes them with orjson if it is installed.
+    @lru_cache(maxsize=ELEMENTS_CACHE_SIZE)
+    def build_elements(selected_nodes):
         nodes = []
-        edges = []
 
         for id in selected_nodes:
             page = cg.get_page_from_id(id)
             node = {
-                "data": {"id": id, "label": page.title.replace("_", " ")},
-                "classes": page.namespace,
+                "data": {"id": id, "label": page.display_title},
+                "classes": f"{page.namespace} root"
+                if id == root.id
+                else page.namespace,
             }
 
-            if node["data"]["id"] == root.id:
-                node["classes"] += " root"
-
             nodes.append(node)
-            for child_id in cg.get_children(id=id, return_as="id"):
-                if child_id in selected_nodes:
-                    edges.append(
-                        {
-                            "data": {"source": id, "target": child_id},
-                        }
-                    )
 
-            for parent_id in cg.get_parents(id=id, return_as="id"):
-                if parent_id in selected_nodes:
-                    edges.append(
-                        {
-                            "data": {"source": parent_id, "target": id},
-                        }
-                    )
+        # The edges are found on the dense indices of the graph (without the hidden
+        # categories, like get_children and get_parents): each row is intersected
+        # with the selection in C, and only the IDs of the edges are built
+        dense_to_id = dict(zip(cg.to_dense_ids(selected_nodes), selected_nodes))
+        selected = set(dense_to_id)
+        get_neighbors = cg.get_dense_neighbors
+
+        edges = [
+            (node, child)
+            for node in selected
+            for child in selected.intersection(get_neighbors(node, "children"))
+        ]
 
-        return nodes + edges
+        # An edge between two selected nodes is found from both of its ends, so the
+        # parents only add the edges that are missing from the children, like the edge
+        # to a hidden category (which get_children leaves out)
+        child_edges = set(edges)
+        edges += [
+            (parent, node)
+            for node in selected
+            for parent in selected.intersection(get_neighbors(node, "parents"))
+            if (parent, node) not in child_edges
+        ]
+
+        # The edges are given IDs, because Cytoscape diffs the elements by ID when they
+        # change: the edges that stay in the graph are kept instead of being re-added.
+        # The dicts are built in one pass over the dense edges, without a list of IDs.
+        return nodes + [
+            {
+                "data": {
+                    "id": f"{dense_to_id[s]}->{dense_to_id[t]}",
+                    "source": dense_to_id[s],
+                    "target": dense_to_id[t],
+                }
+            }
+            for s, t in edges
+        ]
 
 
 def build_app(
@@ -248,12 +344,20 @@ def build_app(
     nodes. The app is built using the components defined in the components module.
     It can be started by using the `wikicat.viewer.run()` function. By default,
     it will use the bootstrap style.
+
+    The responses of the callbacks (e.g. the elements of the graph) are compressed if
+    flask-compress is installed (`pip install flask-compress`, or `pip install
+    wikicat[fast]`), unless `compress` is given.
     """
     if style is None:
         style = dbc.themes.BOOTSTRAP
 
+    kwargs.setdefault("compress", find_spec("flask_compress") is not None)
+
     ROOT_ID = "((ROOT))"
-    cg = utils.insert_artificial_root_node(cg, ROOT_ID)
+    # the root node is inserted in the graph by the first app that is built for it
+    if not cg.contains_id(ROOT_ID):
+        cg = utils.insert_artificial_root_node(cg, ROOT_ID)
     root = cg.get_page_from_id(ROOT_ID)
 
     # Define app
@@ -281,7 +385,16 @@ def build_app(
     return app
 
 
-def run(load_dir, load_name, port=8050, host="0.0.0.0", debug=True, app=None):
+def run(
+    load_dir,
+    load_name,
+    port=8050,
+    host="0.0.0.0",
+    debug=True,
+    app=None,
+    use_reloader=False,
+    csr_cache=False,
+):
     """
     Runs the app. If `app` is None, a new app is built. Otherwise, the given app is
     used. The app is built using the `wikicat.viewer.build_app()` function.
@@ -301,6 +414,15 @@ def run(load_dir, load_name, port=8050, host="0.0.0.0", debug=True, app=None):
         other devices on the network.
     debug : bool, optional
         Whether to run the app in debug mode, by default True
+    app : dash.Dash, optional
+        The app to run, by default None to build a new app with `build_app`.
+    use_reloader : bool, optional
+        Whether to restart the app when the code changes in debug mode, by default
+        False. The reloader runs the app in a second process, which loads the
+        category graph a second time.
+    csr_cache : bool, optional
+        Whether to cache the adjacency of the category graph next to the JSON file,
+        by default False. See `wikicat.CategoryGraph.read_json` for more details.
 
     Example
     -------
@@ -312,10 +434,10 @@ def run(load_dir, load_name, port=8050, host="0.0.0.0", debug=True, app=None):
     """
     # Load category graph and insert artificial root node
     load_dir = Path(load_dir).expanduser()
-    cg = CategoryGraph.read_json(load_dir / load_name)
+    cg = CategoryGraph.read_json(load_dir / load_name, csr_cache=csr_cache)
 
     # Build app and run
     if app is None:
         app = build_app(cg)
 
-    app.run_server(debug=debug, host=host, port=port)
+    app.run(debug=debug, host=host, port=port, use_reloader=use_reloader)
@@ -4,6 +4,20 @@ from pathlib import Path
 from . import run
 
 
+def _parse_bool(text):
+    # type=bool would turn any non-empty text, including "False", into True
+    value = text.lower()
+    if value in ("true", "1", "yes"):
+        return True
+    if value in ("false", "0", "no"):
+        return False
+
+    raise argparse.ArgumentTypeError(
+        f"invalid boolean value: {text!r}. It should be one of: true, false, 1, 0, "
+        "yes, no."
+    )
+
+
 def build_parser():
     """
     Builds the argument parser for the `wikicat.viewer` module. The parser is used
@@ -37,18 +51,40 @@ def build_parser():
     parser.add_argument("--day", "-d", type=int, required=True, help="Day of dump")
     parser.add_argument("--port", type=int, default=8050)
     parser.add_argument("--host", type=str, default="0.0.0.0")
-    parser.add_argument("--debug", type=bool, default=True)
+    parser.add_argument("--debug", type=_parse_bool, default=True)
+    parser.add_argument(
+        "--use_reloader",
+        action="store_true",
+        help="Restart the app when the code changes in debug mode. The reloader runs "
+        "the app in a second process, which loads the category graph again.",
+    )
+    parser.add_argument(
+        "--csr_cache",
+        action="store_true",
+        help="Cache the adjacency of the category graph next to the JSON file, so "
+        "the next runs load it instead of rebuilding it.",
+    )
 
     return parser
 
 
-def main(base_dir, year, month, day, port, host, debug):
+def main(
+    base_dir, year, month, day, port, host, debug, use_reloader=False, csr_cache=False
+):
     load_dir = Path(base_dir).expanduser() / f"enwiki_{year}_{month:02d}_{day:02d}"
     load_name = "category_graph.json"
-    run(load_dir, load_name, port, host, debug)
+    run(
+        load_dir,
+        load_name,
+        port,
+        host,
+        debug,
+        use_reloader=use_reloader,
+        csr_cache=csr_cache,
+    )
 
 
 if __name__ == "__main__":
     parser = build_parser()
     args = parser.parse_args()
-    run(**vars(args))
+    main(**vars(args))
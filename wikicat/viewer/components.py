@@ -57,6 +57,7 @@ def generate_cytoscape_stylesheet(
     category_color="#503B31",
     selected_node_border_color="blue",
     edge_color="#705d56",
+    min_zoomed_font_size=8,
 ) -> list:
     """
     Generate a stylesheet for the Cytoscape graph. The stylesheet is a list of
@@ -64,8 +65,10 @@ def generate_cytoscape_stylesheet(
     is a CSS-style string that specifies which elements the style should be applied to.
     The style is a dictionary that specifies the CSS style to be applied to the elements.
 
-    The parameters are the colors to be used for the different elements. If you want to
-    have more control over the style, you can use the
+    The parameters are the colors to be used for the different elements, and the font
+    size (in pixels, at the current zoom) below which the labels are not drawn, so that
+    zooming out of a large graph does not render thousands of unreadable labels. If you
+    want to have more control over the style, you can use the
     [Cytoscape documentation](https://dash.plotly.com/cytoscape/styling) to create your own.
     """
     return [
@@ -81,7 +84,11 @@ def generate_cytoscape_stylesheet(
         },
         {
             "selector": "node",
-            "style": {"label": "data(label)", "text-wrap": "wrap"},
+            "style": {
+                "label": "data(label)",
+                "text-wrap": "wrap",
+                "min-zoomed-font-size": min_zoomed_font_size,
+            },
         },
         {
             "selector": "edge",
@@ -146,7 +153,7 @@ def build_dropdowns(cg: CategoryGraph, id="dd-choose-tlc") -> Dropdowns:
         choose_tlc=dbc.Select(
             id=id,
             options=[
-                {"label": p.title.replace("_", " "), "value": p.id}
+                {"label": p.display_title, "value": p.id}
                 for p in cg.get_top_level_categories()
             ],
         )
@@ -327,7 +334,7 @@ def build_layout(
     >>> ...
     >>> app.layout = build_layout(cyto_graph, panel, cards_column, sto)
     >>> ...
-    >>> app.run_server(debug=True)
+    >>> app.run(debug=True)
     """
     return dbc.Container(
         [
@@ -1,15 +1,12 @@
-from collections import deque
-
 import dash
 from .. import CategoryGraph, Page
-from ..constants import ARTICLE, CATEGORY
 
 
 def bfs_with_backlinks(cg: CategoryGraph, article: Page, target: Page):
     """
-    Breadth-first search with backlinks. Returns a dictionary of {child: parent} pairs,
-    linking the target category to the article. It does not necessarily return the shortest path.
-    This function is meant to be used with the `extract_chain` function.
+    Bidirectional breadth-first search with backlinks. Returns a dictionary of
+    {parent: child} pairs, linking the target category to the article through the
+    shortest path. This function is meant to be used with the `extract_chain` function.
 
     Parameters
     ----------
@@ -23,23 +20,80 @@ def bfs_with_backlinks(cg: CategoryGraph, article: Page, target: Page):
     Returns
     -------
     dict
-        A dictionary of {child: parent} pairs, linking the target category to the article.
+        A dictionary of {parent: child} pairs, linking the target category to the
+        article, or None if the target cannot be reached from the article.
+
+    Notes
+    -----
+    The search goes up the parents of the article and down the children of the
+    target at the same time, one level at a time, always expanding the side with the
+    smaller frontier. It stops at the first level where both sides meet, so it visits
+    far fewer pages than searching from the article alone when the path is long.
     """
-    queue = deque([article])
-    backlinks = {}
-
-    while queue:
-        page = queue.popleft()
-        if page == target:
-            return backlinks
-
-        for parent in cg.get_parents(page):
-            if parent.id not in backlinks:
-                backlinks[parent.id] = page.id
-                queue.append(parent)
+    if article.id == target.id:
+        return {}
+
+    # The search runs on the dense indices of the graph (without the hidden
+    # categories, like get_parents and get_children), so no ID strings or lists are
+    # built for the pages that are only visited
+    start, end = cg.to_dense_ids([article.id, target.id])
+    get_neighbors = cg.get_dense_neighbors
+
+    # {page: (next page towards the start of the search, distance to the start)}
+    up = {start: (None, 0)}
+    down = {end: (None, 0)}
+    up_frontier = [start]
+    down_frontier = [end]
+
+    while up_frontier and down_frontier:
+        expand_up = len(up_frontier) <= len(down_frontier)
+        if expand_up:
+            frontier, visited, other = up_frontier, up, down
+            direction = "parents"
+        else:
+            frontier, visited, other = down_frontier, down, up
+            direction = "children"
+
+        next_frontier = []
+        meeting = None
+        for page in frontier:
+            distance = visited[page][1] + 1
+            for next_page in get_neighbors(page, direction):
+                if next_page in visited:
+                    continue
+                visited[next_page] = (page, distance)
+                next_frontier.append(next_page)
+
+                # the meeting closest to the other start gives the shortest path
+                if next_page in other and (
+                    meeting is None or other[next_page][1] < other[meeting][1]
+                ):
+                    meeting = next_page
+
+        if meeting is not None:
+            return _join_backlinks(cg, up, down, meeting)
+
+        if expand_up:
+            up_frontier = next_frontier
+        else:
+            down_frontier = next_frontier
+
     return None
 
 
+def _join_backlinks(cg: CategoryGraph, up: dict, down: dict, meeting: int) -> dict:
+    # the path from the target down to the article, as dense indices
+    path = [meeting]
+    while down[path[0]][0] is not None:
+        path.insert(0, down[path[0]][0])
+    while up[path[-1]][0] is not None:
+        path.append(up[path[-1]][0])
+
+    # each page on the path links to the next one, towards the article
+    path = cg.from_dense_ids(path)
+    return dict(zip(path, path[1:]))
+
+
 def extract_chain(backlinks: dict, article: Page, target: Page) -> list:
     """
     Extracts the chain of categories from the backlinks dictionary returned by `bfs_with_backlinks`.
@@ -84,12 +138,24 @@ def was_triggered(component, prop: str):
     prop
         The prop to check. For example, "value" or "n_clicks".
     """
-    ctx = dash.callback_context
-    if not ctx.triggered:
-        return False
+    # {"<component id>.<prop>": component id} of the inputs that triggered the callback
+    return f"{component.id}.{prop}" in dash.callback_context.triggered_prop_ids
+
 
-    triggered_id, triggered_prop = ctx.triggered[0]["prop_id"].split(".", 1)
-    return component.id == triggered_id and prop == triggered_prop
+def triggered_id():
+    """
+    Returns the ID of the component that triggered the current Dash callback, or None
+    if the callback was not triggered by a component (e.g. when the app is loaded).
+    It is read once from `dash.callback_context.triggered_id`, so a callback with
+    multiple inputs can dispatch on it with a dictionary lookup, instead of calling
+    `was_triggered` for each input.
+
+    Returns
+    -------
+    str
+        The ID of the component that triggered the callback, or None.
+    """
+    return dash.callback_context.triggered_id
 
 
 def insert_artificial_root_node(cg: CategoryGraph, root_id: str):
@@ -109,12 +175,11 @@ def insert_artificial_root_node(cg: CategoryGraph, root_id: str):
     cg
         The modified `wikicat.CategoryGraph` object (same object as the input).
     """
-    cg.id_to_title[root_id] = root_id
-    cg.id_to_namespace[root_id] = "category"
-    cg.title_to_id[CATEGORY][root_id] = root_id
-    cg.parents_to_children[root_id] = " ".join(
-        cg.get_top_level_categories(return_as="id")
+    cg._append_page(
+        id=root_id,
+        title=root_id,
+        namespace="category",
+        child_ids=cg.get_top_level_categories(return_as="id"),
     )
-    cg.children_to_parents[root_id] = ""
 
     return cg